@@ -0,0 +1,1001 @@
+import os
+from datetime import datetime
+from pathlib import Path
+
+import gspread
+import numpy as np
+import pandas as pd
+from google.oauth2.service_account import Credentials
+
+# Pipeline de dados do dashboard sem Streamlit: leitura das abas, limpeza e normalização,
+# índice dos filtros, agregados, rankings, séries, percentis e alertas.
+# O streamlit_app.py usa estas funções (com cache por versão dos dados) e o
+# relatorio_metricas.py roda o mesmo pipeline pela linha de comando.
+
+# Aba lida de arquivo local, com a mesma interface do gspread usada pelo dashboard
+class AbaArquivoLocal:
+    """
+    Aba de um arquivo local (xlsx, CSV ou Parquet), somente leitura.
+    Imita get_values()/get_all_records() do gspread com valores não formatados:
+    números como números e datas como número de série, igual ao Sheets.
+    """
+    somente_leitura = True
+
+    def __init__(self, title, caminho):
+        self.title = title
+        self.caminho = Path(caminho)
+        self._cache = (None, [])
+
+    def _ler_linhas(self):
+        # Relê o arquivo só quando ele muda no disco
+        modificado_em = self.caminho.stat().st_mtime
+        if self._cache[0] == modificado_em:
+            return self._cache[1]
+
+        sufixo = self.caminho.suffix.lower()
+        if sufixo in ('.xlsx', '.xls'):
+            df = pd.read_excel(self.caminho, sheet_name=self.title, header=None, dtype=object)
+        elif sufixo == '.csv':
+            df = pd.read_csv(self.caminho, header=None, dtype=str, keep_default_na=False)
+        elif sufixo == '.parquet':
+            df = pd.read_parquet(self.caminho)
+            df = pd.concat([pd.DataFrame([df.columns], columns=df.columns), df.astype(object)], ignore_index=True)
+        else:
+            raise ValueError(f"Formato de arquivo não suportado: {self.caminho.name}")
+
+        # Células vazias viram '' e datas viram número de série, como na API do Sheets
+        df = df.astype(object).where(df.notna(), '')
+        origem_serial = pd.Timestamp('1899-12-30')
+        linhas = []
+        for linha in df.values.tolist():
+            linha = [(valor - origem_serial) / pd.Timedelta(days=1) if isinstance(valor, datetime) else valor
+                     for valor in linha]
+            while linha and linha[-1] == '':
+                linha.pop()
+            linhas.append(linha)
+        while linhas and not linhas[-1]:
+            linhas.pop()
+
+        self._cache = (modificado_em, linhas)
+        return linhas
+
+    def get_values(self, range_name=None):
+        # Intervalos A1 sem nome da aba, ex.: "1:1", "A2:C", "F71:H"; sem intervalo, a aba inteira
+        grade = gspread.utils.a1_range_to_grid_range(range_name) if range_name else {}
+        linhas = self._ler_linhas()[grade.get('startRowIndex', 0):grade.get('endRowIndex')]
+        valores = []
+        for linha in linhas:
+            linha = linha[grade.get('startColumnIndex', 0):grade.get('endColumnIndex')]
+            while linha and linha[-1] == '':
+                linha.pop()
+            valores.append(linha)
+        while valores and not valores[-1]:
+            valores.pop()
+        return valores
+
+    def get_all_records(self):
+        linhas = self._ler_linhas()
+        if not linhas:
+            return []
+        cabecalho = [str(nome) for nome in linhas[0]]
+        return [dict(zip(cabecalho, gspread.utils.numericise_all(linha))) for linha in linhas[1:]]
+
+    def append_row(self, *args, **kwargs):
+        raise RuntimeError(f"A fonte de dados local ({self.caminho.name}) é somente leitura")
+
+def configuracao_fonte(config=None):
+    """
+    Retorna {'tipo': 'gsheets' | 'arquivo', 'caminho': ..., 'chave_planilha': ...} a partir da
+    seção [fonte_dados] do secrets.toml. As variáveis FONTE_DADOS, FONTE_DADOS_CAMINHO e
+    FONTE_DADOS_CHAVE têm prioridade.
+    """
+    config = config or {}
+    tipo = os.environ.get("FONTE_DADOS", config.get("tipo", "gsheets"))
+    caminho = os.environ.get("FONTE_DADOS_CAMINHO", config.get("caminho", "manutencao.xlsx"))
+    chave_planilha = os.environ.get("FONTE_DADOS_CHAVE", config.get("chave_planilha", ""))
+    return {'tipo': tipo, 'caminho': caminho, 'chave_planilha': chave_planilha}
+
+ESCOPO_GSHEETS = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/drive"
+]
+
+def abrir_gsheets(conta_servico, chave_planilha="", chamar=None):
+    """
+    Autoriza a conta de serviço e abre a planilha pela chave (sem busca no Drive) ou,
+    sem chave configurada, pelo título. Retorna (client, planilha, abas).
+    `chamar(funcao, *args)` envolve as chamadas à API (o dashboard passa o chamar_api,
+    com limite de taxa e novas tentativas); sem ele, chama direto.
+    """
+    chamar = chamar or (lambda funcao, *args: funcao(*args))
+    creds = Credentials.from_service_account_info(conta_servico, scopes=ESCOPO_GSHEETS)
+    client = gspread.authorize(creds)
+
+    if chave_planilha:
+        planilha = chamar(client.open_by_key, chave_planilha)
+    else:
+        planilha = chamar(client.open, "Produtividade")
+
+    abas = {nome: chamar(planilha.worksheet, nome) for nome in ("Manutenção", "Controlador")}
+    return client, planilha, abas
+
+def abrir_arquivo_local(caminho):
+    """
+    Abre as abas Manutenção e Controlador de um arquivo local.
+    `caminho` pode ser um .xlsx com as duas abas ou uma pasta com
+    manutencao.{xlsx,csv,parquet} e controlador.{xlsx,csv,parquet}.
+    """
+    caminho = Path(caminho)
+    if not caminho.is_absolute():
+        caminho = Path(__file__).parent / caminho
+
+    if caminho.is_dir():
+        abas = []
+        for nome, base in [("Manutenção", "manutencao"), ("Controlador", "controlador")]:
+            arquivos = [caminho / f"{base}{sufixo}" for sufixo in ('.parquet', '.csv', '.xlsx')]
+            arquivo = next((a for a in arquivos if a.exists()), None)
+            if arquivo is None:
+                raise FileNotFoundError(f"Nenhum arquivo da aba {nome} em {caminho}")
+            abas.append(AbaArquivoLocal(nome, arquivo))
+        return tuple(abas)
+
+    return AbaArquivoLocal("Manutenção", caminho), AbaArquivoLocal("Controlador", caminho)
+
+# Colunas realmente usadas pelo dashboard em cada aba (projeção na leitura)
+COLUNAS_DASHBOARD = {
+    "Manutenção": ['ID', 'Atividade', 'Módulo', 'Data Abertura', 'Data Entrega', 'Responsável',
+                   'Falha/ Teste em Produção', 'Status', 'Sprint'],
+    "Controlador": ['ID', 'Atividade', 'Módulo', 'Data Abertura', 'Data Entrega', 'Responsável', 'Pontos']
+}
+
+# Prazo estabelecido pela gestão (48 horas = 2 dias)
+PRAZO_GESTAO = 2
+
+def registros_para_dataframe(colunas, linhas):
+    """
+    Converte linhas da planilha em DataFrame, como o get_all_records()
+    """
+    registros = []
+    for linha in linhas:
+        linha = linha[:len(colunas)] + [''] * (len(colunas) - len(linha))
+        registros.append(gspread.utils.numericise_all(linha))
+    return pd.DataFrame(registros, columns=colunas)
+
+def ler_linhas_aba(aba):
+    """
+    Todas as linhas da aba com valores não formatados (números como números e datas
+    como número de série), como na leitura em lote do dashboard
+    """
+    if isinstance(aba, gspread.Worksheet):
+        return aba.get_values(
+            value_render_option=gspread.utils.ValueRenderOption.unformatted,
+            date_time_render_option=gspread.utils.DateTimeOption.serial_number
+        )
+    return aba.get_values()
+
+def carregar_aba(aba, limpar_dados, normalizar_dados):
+    """
+    Lê a aba inteira numa chamada, só com as colunas usadas pelo dashboard, e passa
+    pela mesma limpeza e normalização da sincronização
+    """
+    linhas = ler_linhas_aba(aba)
+    cabecalho = [str(nome) for nome in (linhas[0] if linhas else [])]
+    colunas_usadas = COLUNAS_DASHBOARD.get(aba.title)
+    indices = [indice for indice, nome in enumerate(cabecalho) if colunas_usadas is None or nome in colunas_usadas]
+    projetadas = [[linha[indice] if indice < len(linha) else '' for indice in indices] for linha in linhas[1:]]
+    # Como na leitura por faixas: linhas vazias no fim (nas colunas usadas) não entram
+    while projetadas and all(valor == '' for valor in projetadas[-1]):
+        projetadas.pop()
+    colunas = [cabecalho[indice] for indice in indices]
+    return normalizar_dados(limpar_dados(registros_para_dataframe(colunas, projetadas)))
+
+# Agregados aditivos por célula (Responsável, Módulo, Sprint, Status, Mês), mantidos
+# incrementalmente: cada sincronização ou inserção soma só as células das linhas novas
+CHAVES_CELULAS = ['Responsável', 'Módulo', 'Sprint', 'Status', 'Mês']
+
+PERCENTIS_SLA = [50, 90, 99]
+
+def agregar_celulas(df):
+    """
+    Soma, por célula, as linhas dadas: quantidade, concluídas, soma e quantidade de tempos
+    de entrega das concluídas, falhas, dentro/fora do prazo e pontos (o que existir na aba)
+    """
+    concluida = (df['Status'] == 'Concluída').to_numpy() if 'Status' in df.columns else np.zeros(len(df), dtype=bool)
+    colunas = {'linhas': np.ones(len(df))}
+    if 'Status' in df.columns:
+        colunas['concluidas'] = concluida
+    if 'Tempo Entrega (dias)' in df.columns:
+        tempo = df['Tempo Entrega (dias)'].to_numpy(dtype=float)
+        com_tempo = concluida & ~np.isnan(tempo)
+        colunas['concluidas_com_tempo'] = com_tempo
+        colunas['soma_tempo_concluidas'] = np.where(com_tempo, tempo, 0)
+    if 'Falha/ Teste em Produção' in df.columns:
+        colunas['falhas'] = (df['Falha/ Teste em Produção'] == 'Sim').to_numpy()
+    if 'Cumpriu Prazo' in df.columns:
+        colunas['dentro_prazo'] = concluida & (df['Cumpriu Prazo'] == 'Dentro do Prazo').to_numpy()
+        colunas['fora_prazo'] = concluida & (df['Cumpriu Prazo'] == 'Fora do Prazo').to_numpy()
+    if 'Pontos' in df.columns:
+        colunas['pontos'] = df['Pontos'].to_numpy(dtype=float)
+
+    valores = pd.DataFrame(colunas, index=df.index).astype(float)
+    # Chaves como texto: células de lotes diferentes se somam pelo valor, não pelo código da categoria
+    chaves = [df[coluna].astype(str) for coluna in CHAVES_CELULAS if coluna in df.columns]
+    return valores.groupby(chaves, dropna=False).sum()
+
+def agregar_tempos(df):
+    """
+    Histogramas do tempo de entrega: quantas concluídas com tempo há por célula e tempo.
+    O tempo é um número inteiro de dias, então as contagens dão percentis exatos e se
+    juntam por soma, como as células. Ficam numa Series à parte, só com as concluídas
+    com tempo, para o tempo não multiplicar as células do resumo.
+    """
+    if 'Status' not in df.columns or 'Tempo Entrega (dias)' not in df.columns:
+        return pd.Series(dtype=float, name='concluidas')
+    tempo = df['Tempo Entrega (dias)'].to_numpy(dtype=float)
+    concluidas = df[(df['Status'] == 'Concluída').to_numpy() & ~np.isnan(tempo)]
+    chaves = [concluidas[coluna].astype(str) for coluna in CHAVES_CELULAS if coluna in concluidas.columns]
+    chaves.append(concluidas['Tempo Entrega (dias)'].astype(float))
+    return pd.Series(1.0, index=concluidas.index, name='concluidas').groupby(chaves, dropna=False).sum()
+
+def somar_celulas(celulas, celulas_novas):
+    """
+    Soma células (ou histogramas de tempo) de dois lotes de linhas
+    """
+    if celulas_novas.empty:
+        return celulas
+    if celulas.empty:
+        return celulas_novas
+    return celulas.add(celulas_novas, fill_value=0)
+
+def mascara_celulas(celulas, selecoes):
+    """
+    Células que atendem às seleções {dimensão: [valores]} (lista vazia não filtra)
+    """
+    mascara = np.ones(len(celulas), dtype=bool)
+    for dimensao, valores in selecoes.items():
+        if valores and dimensao in celulas.index.names:
+            mascara &= celulas.index.get_level_values(dimensao).isin(valores)
+    return mascara
+
+def resumo_celulas(celulas, selecoes):
+    """
+    Totais das células que atendem às seleções
+    """
+    return celulas[mascara_celulas(celulas, selecoes)].sum()
+
+def percentis_histograma(tempos, contagens, percentis=PERCENTIS_SLA):
+    """
+    Percentis (interpolação linear, como no numpy) de um histograma de tempos ordenados
+    """
+    acumulado = np.cumsum(contagens)
+    total = acumulado[-1]
+    resultado = []
+    for percentil in percentis:
+        posicao = (total - 1) * percentil / 100
+        abaixo, acima = tempos[np.searchsorted(acumulado, [np.floor(posicao), np.ceil(posicao)], side='right')]
+        resultado.append(abaixo + (posicao - np.floor(posicao)) * (acima - abaixo))
+    return resultado
+
+def percentis_tempos(tempos, selecoes, dimensao=None, percentis=PERCENTIS_SLA):
+    """
+    Percentis do tempo de entrega das concluídas nas células selecionadas, juntando os
+    histogramas de agregar_tempos; com dimensão, uma linha por valor dela.
+    DataFrame com as concluídas consideradas e uma coluna por percentil.
+    """
+    colunas = ['Concluídas'] + [f'P{percentil} (dias)' for percentil in percentis]
+    if tempos.empty or 'Tempo Entrega (dias)' not in tempos.index.names:
+        return pd.DataFrame(columns=colunas, dtype=float).rename_axis(dimensao)
+
+    niveis = ['Tempo Entrega (dias)'] if dimensao is None else [dimensao, 'Tempo Entrega (dias)']
+    contagens = tempos[mascara_celulas(tempos, selecoes)].groupby(level=niveis).sum()
+    contagens = contagens[contagens > 0]
+    if contagens.empty:
+        return pd.DataFrame(columns=colunas, dtype=float).rename_axis(dimensao)
+
+    histogramas = contagens.reset_index(name='contagem')
+    histogramas['Tempo Entrega (dias)'] = histogramas['Tempo Entrega (dias)'].astype(float)
+    grupos = [(None, histogramas)] if dimensao is None else histogramas.groupby(dimensao)
+    linhas = {}
+    for valor, histograma in grupos:
+        histograma = histograma.sort_values('Tempo Entrega (dias)')
+        contagem = histograma['contagem'].to_numpy()
+        linhas[valor] = [contagem.sum()] + percentis_histograma(
+            histograma['Tempo Entrega (dias)'].to_numpy(), contagem, percentis
+        )
+    resultado = pd.DataFrame.from_dict(linhas, orient='index', columns=colunas)
+    resultado.index.name = dimensao
+    resultado['Concluídas'] = resultado['Concluídas'].astype(int)
+    return resultado
+
+def converter_datas(serie):
+    """
+    Converte datas vindas como número de série (valores não formatados) para datetime64.
+    Só as células que vieram como texto passam pelo parser de datas: primeiro ISO
+    (AAAA-MM-DD), depois o padrão brasileiro com o dia primeiro (01/10/2025 é 1º de outubro).
+    """
+    numeros = pd.to_numeric(serie, errors='coerce')
+    datas = pd.to_datetime(numeros, unit='D', origin='1899-12-30')
+    textos = serie[numeros.isna() & serie.astype(str).str.strip().ne('')]
+    if not textos.empty:
+        convertidas = pd.to_datetime(textos, format='ISO8601', errors='coerce')
+        dia_primeiro = convertidas.isna()
+        if dia_primeiro.any():
+            convertidas[dia_primeiro] = pd.to_datetime(textos[dia_primeiro], format='mixed', dayfirst=True, errors='coerce')
+        datas.loc[textos.index] = convertidas
+    return datas
+
+def limpar_dados_manutencao(df_principal):
+    """
+    Limpeza dos dados da aba Manutenção (linha a linha, serve para linhas novas)
+    """
+    # Planilhas antigas (ex.: manutencao.xlsx) não têm a coluna Sprint
+    if 'Sprint' not in df_principal.columns:
+        df_principal['Sprint'] = ''
+
+    # Limpeza dos dados PRINCIPAIS - trata valores NaN
+    # USANDO OS NOMES CORRETOS DA SUA PLANILHA
+    if 'Responsável' in df_principal.columns:
+        df_principal['Responsável'] = df_principal['Responsável'].fillna('Sem Responsável')
+    if 'Módulo' in df_principal.columns:
+        df_principal['Módulo'] = df_principal['Módulo'].fillna('Sem Módulo')
+    if 'Status' in df_principal.columns:
+        df_principal['Status'] = df_principal['Status'].fillna('Sem Status')
+    if 'Falha / Teste em Produção' in df_principal.columns:  # NOME CORRETO!
+        df_principal['Falha / Teste em Produção'] = df_principal['Falha / Teste em Produção'].fillna('Não')
+
+    # Converte para string (se as colunas existirem)
+    colunas_string = ['Responsável', 'Módulo', 'Status', 'Falha / Teste em Produção']  # NOME CORRETO!
+    for coluna in colunas_string:
+        if coluna in df_principal.columns:
+            df_principal[coluna] = df_principal[coluna].astype(str)
+
+    # Converter datas (se as colunas existirem)
+    if 'Data Abertura' in df_principal.columns:
+        df_principal['Data Abertura'] = converter_datas(df_principal['Data Abertura'])
+    if 'Data Entrega' in df_principal.columns:
+        df_principal['Data Entrega'] = converter_datas(df_principal['Data Entrega'])
+
+    return df_principal
+
+def limpar_dados_controlador(df_controlador):
+    """
+    Limpeza básica dos dados da aba Controlador
+    """
+    colunas_data = [coluna for coluna in ['Data Abertura', 'Data Entrega'] if coluna in df_controlador.columns]
+    for coluna in colunas_data:
+        df_controlador[coluna] = converter_datas(df_controlador[coluna])
+    colunas_texto = [coluna for coluna in df_controlador.columns if coluna not in colunas_data]
+    df_controlador[colunas_texto] = df_controlador[colunas_texto].fillna('')
+    return df_controlador
+
+# Colunas de poucos valores distintos, guardadas como category
+COLUNAS_CATEGORICAS = {
+    "Manutenção": ['Responsável', 'Módulo', 'Status', 'Falha/ Teste em Produção', 'Sprint', 'Cumpriu Prazo'],
+    "Controlador": ['Responsável', 'Módulo']
+}
+
+def normalizar_tipos(df, nome_aba):
+    """
+    Tipos finais comuns às duas abas: IDs inteiros, datas datetime64,
+    tempo de entrega numérico e categorias nas colunas de poucos valores
+    """
+    if 'ID' in df.columns:
+        df['ID'] = pd.to_numeric(df['ID'], errors='coerce').astype('Int64')
+    for coluna in ['Data Abertura', 'Data Entrega']:
+        if coluna in df.columns and not pd.api.types.is_datetime64_any_dtype(df[coluna]):
+            df[coluna] = pd.to_datetime(df[coluna], errors='coerce')
+    if 'Tempo Entrega (dias)' in df.columns:
+        df['Tempo Entrega (dias)'] = pd.to_numeric(df['Tempo Entrega (dias)'], errors='coerce')
+    for coluna in COLUNAS_CATEGORICAS[nome_aba]:
+        if coluna in df.columns and not isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            df[coluna] = df[coluna].astype(str).astype('category')
+    return df
+
+def dias_inteiros(datas):
+    """
+    Datas como número inteiro de dias desde 1970-01-01 (NaT vira NaN)
+    """
+    dias = datas.values.astype('datetime64[D]')
+    return np.where(np.isnat(dias), np.nan, dias.astype('int64'))
+
+def calcular_colunas_derivadas(df_principal):
+    """
+    Colunas derivadas da aba Manutenção, todas vetorizadas:
+    tempo de entrega, cumprimento do prazo e mês de abertura
+    """
+    if all(col in df_principal.columns for col in ['Data Abertura', 'Data Entrega']):
+        # Calcular tempo de entrega (NaN quando falta alguma das datas)
+        tempo_entrega = dias_inteiros(df_principal['Data Entrega']) - dias_inteiros(df_principal['Data Abertura'])
+        df_principal['Tempo Entrega (dias)'] = tempo_entrega
+
+        # Classificar se cumpriu o prazo (apenas atividades concluídas)
+        concluidas = (df_principal['Status'] == 'Concluída').to_numpy() & ~np.isnan(tempo_entrega)
+        df_principal['Cumpriu Prazo'] = pd.Categorical(
+            np.select(
+                [concluidas & (tempo_entrega <= PRAZO_GESTAO), concluidas],
+                ['Dentro do Prazo', 'Fora do Prazo'],
+                'Não Concluída'
+            ),
+            categories=['Dentro do Prazo', 'Fora do Prazo', 'Não Concluída']
+        )
+
+    if 'Data Abertura' in df_principal.columns:
+        # Mês de abertura (AAAA-MM): aritmética inteira, texto só para os meses distintos
+        abertura = df_principal['Data Abertura']
+        mes_absoluto = abertura.dt.year * 12 + abertura.dt.month - 1
+        codigos, meses = pd.factorize(mes_absoluto, sort=True)
+        rotulos = [f"{int(mes) // 12:04d}-{int(mes) % 12 + 1:02d}" for mes in meses]
+        df_principal['Mês'] = pd.Categorical.from_codes(codigos, categories=rotulos)
+
+    return df_principal
+
+def normalizar_manutencao(df_principal):
+    """
+    Normalização da aba Manutenção - roda uma vez por versão dos dados
+    """
+    return normalizar_tipos(calcular_colunas_derivadas(df_principal), "Manutenção")
+
+def normalizar_controlador(df_controlador):
+    """
+    Normalização da aba Controlador - roda uma vez por versão dos dados
+    (antes era refeita a cada interação dentro da aba Controlador)
+    """
+    # Preencher valores vazios
+    df_controlador['Responsável'] = df_controlador['Responsável'].fillna('Sem Responsável')
+    df_controlador['Módulo'] = df_controlador['Módulo'].fillna('Sem Módulo')
+    df_controlador['Pontos'] = pd.to_numeric(df_controlador['Pontos'], errors='coerce').fillna(0)
+
+    # Calcular tempo de entrega
+    df_controlador['Tempo Entrega (dias)'] = dias_inteiros(df_controlador['Data Entrega']) - dias_inteiros(df_controlador['Data Abertura'])
+
+    return normalizar_tipos(df_controlador, "Controlador")
+
+def juntar_normalizados(df_anterior, df_novo):
+    """
+    Acrescenta linhas já normalizadas ao DataFrame acumulado sem renormalizar o histórico
+    (a normalização é linha a linha). As colunas category recebem a união ordenada das
+    categorias, a mesma que o astype('category') daria no DataFrame inteiro.
+    """
+    if df_anterior.empty:
+        return df_novo.reset_index(drop=True)
+    for coluna in df_anterior.columns.intersection(df_novo.columns):
+        tipo_anterior, tipo_novo = df_anterior[coluna].dtype, df_novo[coluna].dtype
+        if not (isinstance(tipo_anterior, pd.CategoricalDtype) and isinstance(tipo_novo, pd.CategoricalDtype)):
+            continue
+        categorias = tipo_anterior.categories.union(tipo_novo.categories)
+        if not categorias.equals(tipo_anterior.categories):
+            df_anterior = df_anterior.assign(**{coluna: df_anterior[coluna].cat.set_categories(categorias)})
+        if not categorias.equals(tipo_novo.categories):
+            df_novo = df_novo.assign(**{coluna: df_novo[coluna].cat.set_categories(categorias)})
+    return pd.concat([df_anterior, df_novo], ignore_index=True)
+
+# Limpeza e normalização de cada aba, usadas também pelo write-through dos formulários
+ETAPAS_ABAS = {
+    "Manutenção": (limpar_dados_manutencao, normalizar_manutencao),
+    "Controlador": (limpar_dados_controlador, normalizar_controlador)
+}
+
+# Índice de envelhecimento das demandas em aberto, montado uma vez por versão dos dados
+STATUS_NAO_FINALIZADOS = ['Pendente', 'Em Andamento', 'Aberta', 'Aberto', 'Open', 'To Do', 'In Progress', 'Em Desenvolvimento']
+
+DIAS_ALERTA = 5
+
+DIAS_CRITICO = 7
+
+def montar_indice_envelhecimento(df):
+    """
+    Grupos de demandas candidatas a alerta, cada um com todas as posições do grupo e as
+    que têm Data Abertura ordenadas da mais antiga para a mais nova (empates na ordem
+    das linhas): 'abertas' (status não finalizado), 'sem_entrega' (sem Data Entrega,
+    usado quando o filtro não tem nenhuma aberta) e 'todas' (aba sem Data Entrega).
+    Os níveis de alerta viram pontos de corte por busca binária na data de hoje.
+    """
+    if 'Data Abertura' not in df.columns:
+        return {}
+    dias = dias_inteiros(df['Data Abertura'])
+    grupos = {'todas': np.ones(len(df), dtype=bool)}
+    if 'Status' in df.columns:
+        grupos['abertas'] = df['Status'].isin(STATUS_NAO_FINALIZADOS).to_numpy()
+    if 'Data Entrega' in df.columns:
+        grupos['sem_entrega'] = df['Data Entrega'].isna().to_numpy()
+
+    indice = {}
+    for nome, mascara in grupos.items():
+        membros = np.flatnonzero(mascara)
+        com_data = membros[~np.isnan(dias[membros])]
+        ordem = com_data[np.argsort(dias[com_data], kind='stable')]
+        indice[nome] = {
+            'membros': membros,
+            'posicoes': ordem,
+            'dias_abertura': dias[ordem].astype('int64')
+        }
+    return indice
+
+def no_filtro(posicoes, posicoes_filtradas):
+    """
+    Máscara das posições que estão no filtro (posições filtradas ordenadas), por busca binária
+    """
+    lugares = np.searchsorted(posicoes_filtradas, posicoes)
+    dentro = lugares < len(posicoes_filtradas)
+    dentro[dentro] = posicoes_filtradas[lugares[dentro]] == posicoes[dentro]
+    return dentro
+
+def cortes_alerta(indice, posicoes_filtradas=None, hoje=None):
+    """
+    Grupo usado para os alertas no filtro e os dois pontos de corte na sua ordem por
+    abertura: [0, críticos) são críticos (DIAS_CRITICO+ dias), [críticos, alertas) são
+    alertas (DIAS_ALERTA+ dias). Sem filtro, o custo é de duas buscas binárias.
+    """
+    if not indice:
+        return None, 0, 0
+    if hoje is None:
+        hoje = (pd.Timestamp.now().normalize() - pd.Timestamp(0)).days
+
+    # Mesma escolha de antes: abertas, senão sem Data Entrega, senão todas
+    nome_grupo = 'todas'
+    if 'abertas' in indice:
+        membros = indice['abertas']['membros']
+        if posicoes_filtradas is None:
+            tem_abertas = len(membros) > 0
+        else:
+            tem_abertas = no_filtro(membros, posicoes_filtradas).any()
+        if tem_abertas:
+            nome_grupo = 'abertas'
+    if nome_grupo == 'todas' and 'sem_entrega' in indice:
+        nome_grupo = 'sem_entrega'
+
+    dias_abertura = indice[nome_grupo]['dias_abertura']
+    criticos = np.searchsorted(dias_abertura, hoje - DIAS_CRITICO, side='right')
+    alertas = np.searchsorted(dias_abertura, hoje - DIAS_ALERTA, side='right')
+    return nome_grupo, int(criticos), int(alertas)
+
+def calcular_dias_em_aberto(df, indice, posicoes_filtradas=None, hoje=None):
+    """
+    Demandas em alerta (DIAS_ALERTA+ dias em aberto) do filtro, das mais antigas para as
+    mais novas, com 'Dias em Aberto' e 'Nível Alerta'. Só as linhas em alerta são
+    tocadas: o recorte sai dos pontos de corte do índice de envelhecimento.
+    Retorna também as contagens (críticos, alertas).
+    """
+    if hoje is None:
+        hoje = (pd.Timestamp.now().normalize() - pd.Timestamp(0)).days
+    nome_grupo, fim_criticos, fim_alertas = cortes_alerta(indice, posicoes_filtradas, hoje)
+    if nome_grupo is None or fim_alertas == 0:
+        return pd.DataFrame(), 0, 0
+
+    posicoes = indice[nome_grupo]['posicoes'][:fim_alertas]
+    critico = np.arange(fim_alertas) < fim_criticos
+    if posicoes_filtradas is not None:
+        dentro = no_filtro(posicoes, posicoes_filtradas)
+        posicoes, critico = posicoes[dentro], critico[dentro]
+    if len(posicoes) == 0:
+        return pd.DataFrame(), 0, 0
+
+    df_alerta = df.take(posicoes)
+    df_alerta['Dias em Aberto'] = (hoje - dias_inteiros(df_alerta['Data Abertura'])).astype('int64')
+    df_alerta['Nível Alerta'] = np.where(critico, '🔴 Crítico', '🟡 Alerta')
+    total_criticos = int(critico.sum())
+    return df_alerta, total_criticos, len(posicoes) - total_criticos
+
+# Índice invertido dos filtros da barra lateral, montado uma vez por versão dos dados
+DIMENSOES_FILTRO = ['Sprint', 'Responsável', 'Módulo', 'Status']
+
+COLUNAS_DATA_INDICE = ['Data Abertura', 'Data Entrega']
+
+def dia_inteiro(data):
+    """
+    Data (date/Timestamp) como número inteiro de dias desde 1970-01-01, como em dias_inteiros
+    """
+    return int(np.datetime64(data, 'D').astype('int64'))
+
+def montar_indice_filtros(df):
+    """
+    Para cada dimensão filtrável: o código de categoria de cada linha e, para cada valor,
+    as posições (ordenadas) das linhas que o têm. Para cada coluna de data: o dia de cada
+    linha e os dias válidos ordenados com a permutação de linhas correspondente, para
+    resolver um período com busca binária. Compartilhado entre as sessões.
+    """
+    indice = {'total_linhas': len(df)}
+    for dimensao in DIMENSOES_FILTRO:
+        if dimensao not in df.columns:
+            continue
+        categorias = df[dimensao].astype('category').cat
+        codigos = categorias.codes.to_numpy()
+        # Uma ordenação estável agrupa as posições de cada valor, já em ordem crescente
+        ordem = np.argsort(codigos, kind='stable')
+        limites = np.searchsorted(codigos[ordem], np.arange(len(categorias.categories) + 1))
+        indice[dimensao] = {
+            'codigos': codigos,
+            'valores': {str(valor): codigo for codigo, valor in enumerate(categorias.categories)},
+            'posicoes': [ordem[inicio:fim] for inicio, fim in zip(limites[:-1], limites[1:])]
+        }
+
+    indice['datas'] = {}
+    for coluna in COLUNAS_DATA_INDICE:
+        if coluna not in df.columns:
+            continue
+        dias = dias_inteiros(df[coluna])
+        validas = np.flatnonzero(~np.isnan(dias))
+        ordem = validas[np.argsort(dias[validas], kind='stable')]
+        indice['datas'][coluna] = {
+            'dias': dias,
+            'dias_ordenados': dias[ordem].astype('int64'),
+            'posicoes': ordem
+        }
+    return indice
+
+def fatia_periodo(indice, coluna, data_inicio, data_fim):
+    """
+    Posições das linhas com a data no período [início, fim], por busca binária
+    nos dias ordenados (fatia contígua; as posições não vêm em ordem de linha)
+    """
+    indice_data = indice['datas'][coluna]
+    inicio = np.searchsorted(indice_data['dias_ordenados'], dia_inteiro(data_inicio), side='left')
+    fim = np.searchsorted(indice_data['dias_ordenados'], dia_inteiro(data_fim), side='right')
+    return indice_data['posicoes'][inicio:fim]
+
+def filtrar_posicoes(indice, selecoes, periodo=None):
+    """
+    Posições das linhas que atendem às seleções {dimensão: [valores]} (lista vazia não filtra)
+    e, se informado, ao período (coluna, início, fim).
+    Começa pela lista de posições mais curta e confere os outros filtros só nessas
+    linhas, então o custo acompanha o tamanho do resultado, não o histórico inteiro.
+    """
+    filtros = []  # (tamanho, posições candidatas, teste nas posições)
+    for dimensao, valores in selecoes.items():
+        if not valores or dimensao not in indice:
+            continue
+        # Valores repetidos (ex.: --sprint X --sprint X no relatório) não duplicam as posições
+        codigos_selecionados = np.unique([indice[dimensao]['valores'][valor] for valor in valores if valor in indice[dimensao]['valores']])
+        if not len(codigos_selecionados):
+            return np.array([], dtype=np.intp)
+        candidatas = np.concatenate([indice[dimensao]['posicoes'][codigo] for codigo in codigos_selecionados])
+        codigos = indice[dimensao]['codigos']
+        filtros.append((
+            len(candidatas),
+            candidatas,
+            lambda posicoes, codigos=codigos, selecionados=codigos_selecionados: np.isin(codigos[posicoes], selecionados)
+        ))
+
+    if periodo is not None:
+        coluna, data_inicio, data_fim = periodo
+        dias = indice['datas'][coluna]['dias']
+        inicio, fim = dia_inteiro(data_inicio), dia_inteiro(data_fim)
+        fatia = fatia_periodo(indice, coluna, data_inicio, data_fim)
+        filtros.append((
+            len(fatia),
+            fatia,
+            lambda posicoes: (dias[posicoes] >= inicio) & (dias[posicoes] <= fim)
+        ))
+
+    if not filtros:
+        return np.arange(indice['total_linhas'])
+
+    filtros.sort(key=lambda filtro: filtro[0])
+    # Volta para a ordem original das linhas
+    posicoes = np.sort(filtros[0][1])
+    for _, _, teste in filtros[1:]:
+        posicoes = posicoes[teste(posicoes)]
+    return posicoes
+
+def contagens_facetas(indice, selecoes, periodo=None):
+    """
+    Para cada dimensão, quantas linhas cada valor teria com os demais filtros ativos
+    (o filtro da própria dimensão não conta, como numa busca facetada).
+    Uma contagem agrupada (bincount) por dimensão, em vez de um filtro por opção.
+    """
+    contagens = {}
+    for dimensao in selecoes:
+        if dimensao not in indice:
+            continue
+        outras = {outra: valores for outra, valores in selecoes.items() if outra != dimensao}
+        codigos = indice[dimensao]['codigos'][filtrar_posicoes(indice, outras, periodo)]
+        por_codigo = np.bincount(codigos[codigos >= 0], minlength=len(indice[dimensao]['valores']))
+        contagens[dimensao] = {valor: int(por_codigo[codigo]) for valor, codigo in indice[dimensao]['valores'].items()}
+    return contagens
+
+# Rankings pré-ordenados por versão dos dados: nome -> (coluna, crescente, condição das linhas)
+ORDENS_RANKING = {
+    "Manutenção": {
+        'mais_atrasadas': ('Tempo Entrega (dias)', False, lambda df: df['Cumpriu Prazo'] == 'Fora do Prazo'),
+        'mais_rapidas': ('Tempo Entrega (dias)', True, lambda df: df['Status'] == 'Concluída')
+    },
+    "Controlador": {
+        'mais_complexas': ('Pontos', False, None)
+    }
+}
+
+def montar_ordens_ranking(nome_aba, df):
+    """
+    Para cada ranking da aba: as posições das linhas elegíveis (valor preenchido e
+    condição atendida) já ordenadas pelo valor e, para cada linha, o seu posto nessa
+    ordem (len(ordem) se não é elegível). Empates ficam na ordem das linhas, como no
+    nlargest/nsmallest. Ao contrário do nlargest/nsmallest do DataFrame, linhas sem
+    valor (ex.: concluída sem Tempo Entrega) nunca entram, mesmo com menos de N elegíveis.
+    Ordenação feita uma vez por versão dos dados.
+    """
+    ordens = {}
+    for nome, (coluna, crescente, condicao) in ORDENS_RANKING.get(nome_aba, {}).items():
+        if coluna not in df.columns:
+            continue
+        valores = df[coluna].to_numpy(dtype=float)
+        elegiveis = ~np.isnan(valores)
+        if condicao is not None:
+            elegiveis &= condicao(df).to_numpy(dtype=bool)
+        posicoes = np.flatnonzero(elegiveis)
+        chave = valores[posicoes] if crescente else -valores[posicoes]
+        ordem = posicoes[np.argsort(chave, kind='stable')]
+        postos = np.full(len(df), len(ordem), dtype=np.intp)
+        postos[ordem] = np.arange(len(ordem))
+        ordens[nome] = {'ordem': ordem, 'postos': postos}
+    return ordens
+
+def primeiras_do_ranking(ranking, quantidade, posicoes_filtradas=None):
+    """
+    As primeiras posições do ranking que estão no filtro (posições ordenadas, como as
+    de filtrar_posicoes). Percorre a ordem em blocos crescentes, confere cada bloco por
+    busca binária e para assim que encontra a quantidade pedida. Se o filtro é estreito
+    (ou a caminhada passa do tamanho do filtro), escolhe direto pelos postos das linhas
+    filtradas.
+    """
+    ordem, postos = ranking['ordem'], ranking['postos']
+    if posicoes_filtradas is None:
+        return ordem[:quantidade]
+
+    # Cada passo da caminhada (busca binária, acesso fora de ordem) custa dezenas de
+    # vezes a leitura de um posto: caminha só se o trecho esperado (quantidade * linhas /
+    # filtradas) cabe nesse orçamento, e desiste ao passar dele
+    limite = len(posicoes_filtradas) // 32
+    if quantidade * len(postos) <= limite * len(posicoes_filtradas):
+        encontradas = []
+        total = 0
+        inicio = 0
+        bloco = max(quantidade * 8, 64)
+        while total < quantidade and inicio < len(ordem) and inicio < limite:
+            trecho = ordem[inicio:inicio + bloco]
+            lugares = np.searchsorted(posicoes_filtradas, trecho)
+            no_filtro = lugares < len(posicoes_filtradas)
+            no_filtro[no_filtro] = posicoes_filtradas[lugares[no_filtro]] == trecho[no_filtro]
+            encontradas.append(trecho[no_filtro])
+            total += int(no_filtro.sum())
+            inicio += bloco
+            bloco *= 2
+        if total >= quantidade or inicio >= len(ordem):
+            return np.concatenate(encontradas)[:quantidade] if encontradas else ordem[:0]
+
+    # Linhas fora do ranking têm posto len(ordem) e ficam por último na partição
+    postos_filtro = postos[posicoes_filtradas]
+    if len(postos_filtro) > quantidade:
+        postos_filtro = np.partition(postos_filtro, quantidade)[:quantidade]
+    postos_filtro = np.sort(postos_filtro)
+    return ordem[postos_filtro[postos_filtro < len(ordem)]]
+
+# Séries temporais em baldes diários por célula (dimensões + dia), uma vez por versão dos dados
+GRANULARIDADES_SERIE = {'Dia': 'D', 'Semana': 'W', 'Mês': 'M', 'Trimestre': 'Q'}
+
+def agregar_serie_diaria(df, dimensoes=()):
+    """
+    Por dia (e pelas dimensões pedidas): atividades abertas (pela Data Abertura),
+    entregues (pela Data Entrega) e pontos entregues, quando a aba tem pontos
+    """
+    dimensoes = [dimensao for dimensao in dimensoes if dimensao in df.columns]
+    chaves = {dimensao: df[dimensao].astype(str).to_numpy() for dimensao in dimensoes}
+    eventos = []
+    if 'Data Abertura' in df.columns:
+        eventos.append(pd.DataFrame({**chaves, 'Dia': dias_inteiros(df['Data Abertura']), 'abertas': 1.0}))
+    if 'Data Entrega' in df.columns:
+        entregas = pd.DataFrame({**chaves, 'Dia': dias_inteiros(df['Data Entrega']), 'entregues': 1.0})
+        if 'Pontos' in df.columns:
+            entregas['pontos_entregues'] = df['Pontos'].to_numpy(dtype=float)
+        eventos.append(entregas)
+    if not eventos:
+        return pd.DataFrame()
+
+    eventos = pd.concat(eventos, ignore_index=True)
+    eventos = eventos[eventos['Dia'].notna()]
+    eventos['Dia'] = eventos['Dia'].astype('int64')
+    return eventos.groupby(dimensoes + ['Dia'], dropna=False).sum().fillna(0)
+
+def montar_series_diarias(df):
+    """
+    Baldes diários da versão: {None: total por dia, dimensão: dimensão × dia} para cada
+    dimensão filtrável. O cruzamento de todas as dimensões por dia teria mais baldes que
+    linhas; em troca, uma consulta com seleções (ou recorte de período) reagrupa as
+    linhas filtradas com agregar_serie_diaria, em vez de usar estes baldes.
+    """
+    series = {None: agregar_serie_diaria(df)}
+    for dimensao in DIMENSOES_FILTRO:
+        if dimensao in df.columns:
+            series[dimensao] = agregar_serie_diaria(df, [dimensao])
+    return series
+
+def consultar_serie(serie, selecoes, granularidade, data_inicio=None, data_fim=None, dimensao=None):
+    """
+    Reagrupa os baldes diários selecionados no período pedido por dia, semana, mês ou
+    trimestre (opcionalmente quebrado por uma dimensão que esteja nos baldes).
+    Trabalha só sobre os baldes, sem tocar nas linhas. DataFrame com 'Período' (início do balde) e as métricas.
+    """
+    if serie.empty:
+        return pd.DataFrame()
+    mascara = mascara_celulas(serie, selecoes)
+    dias = serie.index.get_level_values('Dia').to_numpy()
+    if data_inicio is not None:
+        mascara &= dias >= dia_inteiro(data_inicio)
+    if data_fim is not None:
+        mascara &= dias <= dia_inteiro(data_fim)
+    baldes = serie[mascara]
+    if baldes.empty:
+        return pd.DataFrame()
+
+    # Início do período de cada dia distinto (conversão só nos dias, não nas linhas)
+    dias_distintos, posicao_dia = np.unique(baldes.index.get_level_values('Dia').to_numpy(), return_inverse=True)
+    inicio_periodo = pd.to_datetime(dias_distintos, unit='D').to_period(GRANULARIDADES_SERIE[granularidade]).start_time
+    chaves = [np.asarray(inicio_periodo)[posicao_dia]]
+    nomes = ['Período']
+    if dimensao is not None:
+        chaves.insert(0, baldes.index.get_level_values(dimensao))
+        nomes.insert(0, dimensao)
+    resultado = baldes.groupby(chaves).sum()
+    resultado.index.names = nomes
+    return resultado.reset_index()
+
+def metricas_agrupadas(df, dimensao):
+    """
+    Métricas por valor da dimensão numa única passada (groupby com agregações nativas,
+    sem lambdas nem laço por grupo): total, tempo médio de entrega, taxa de falhas,
+    taxa de conclusão, taxa dentro do prazo (entre as concluídas) e pontos totais.
+    Só entram as métricas cujas colunas existem no DataFrame (ex.: Controlador não tem Status).
+    """
+    auxiliares = {dimensao: df[dimensao], 'total': df['ID']}
+    agregacoes = {'Total': ('total', 'count')}
+    if 'Tempo Entrega (dias)' in df.columns:
+        auxiliares['tempo'] = df['Tempo Entrega (dias)']
+        agregacoes['Tempo Médio (dias)'] = ('tempo', 'mean')
+    if 'Falha/ Teste em Produção' in df.columns:
+        auxiliares['falha'] = (df['Falha/ Teste em Produção'] == 'Sim').astype(float) * 100
+        agregacoes['Taxa Falhas (%)'] = ('falha', 'mean')
+    if 'Status' in df.columns:
+        concluida = df['Status'] == 'Concluída'
+        auxiliares['concluida'] = concluida.astype(float)
+        agregacoes['Taxa Conclusão (%)'] = ('concluida', 'mean')
+        agregacoes['concluidas'] = ('concluida', 'sum')
+        if 'Cumpriu Prazo' in df.columns:
+            auxiliares['dentro_prazo'] = (concluida & (df['Cumpriu Prazo'] == 'Dentro do Prazo')).astype(float)
+            agregacoes['dentro_prazo'] = ('dentro_prazo', 'sum')
+    if 'Pontos' in df.columns:
+        auxiliares['pontos'] = df['Pontos']
+        agregacoes['Pontos Totais'] = ('pontos', 'sum')
+
+    metricas = pd.DataFrame(auxiliares).groupby(dimensao, observed=True).agg(**agregacoes)
+    if 'Taxa Conclusão (%)' in metricas.columns:
+        metricas['Taxa Conclusão (%)'] *= 100
+    if 'dentro_prazo' in metricas.columns:
+        concluidas = metricas['concluidas']
+        metricas['Dentro Prazo (%)'] = np.where(concluidas > 0, metricas['dentro_prazo'] / concluidas.where(concluidas > 0, 1) * 100, 0)
+        metricas = metricas.drop(columns=['dentro_prazo'])
+    return metricas.drop(columns=['concluidas'], errors='ignore')
+
+def analise_por_responsavel(df_filtrado):
+    """
+    Tabela por responsável (total, tempo médio, falhas, prazo) e detalhes das atividades com falha
+    """
+    metricas = metricas_agrupadas(df_filtrado, 'Responsável')
+    resp_analysis = metricas[['Total', 'Tempo Médio (dias)', 'Taxa Falhas (%)']].round(2)
+    resp_analysis['Dentro Prazo (%)'] = metricas['Dentro Prazo (%)']
+    resp_analysis.columns = ['Total Atividades', 'Tempo Médio (dias)', 'Taxa Falhas (%)', 'Dentro Prazo (%)']
+    resp_analysis = resp_analysis.sort_values('Total Atividades', ascending=False)
+    
+    # Detalhes das atividades com falha, agrupadas por responsável (ordem das categorias)
+    atividades_com_falha = df_filtrado[(df_filtrado['Falha/ Teste em Produção'] == 'Sim') & df_filtrado['Responsável'].notna()]
+    atividades_com_falha = atividades_com_falha.sort_values('Responsável', kind='stable')
+    colunas_detalhes = ['Responsável', 'ID', 'Atividade', 'Módulo', 'Tempo Entrega (dias)', 'Status']
+    atividades_com_falha_detalhes = atividades_com_falha.reindex(columns=colunas_detalhes, fill_value='N/A').to_dict('records')
+    return resp_analysis, atividades_com_falha_detalhes
+
+def analise_por_modulo(df_filtrado):
+    """
+    Tabela por módulo (total, tempo médio, falhas, conclusão, prazo)
+    """
+    metricas = metricas_agrupadas(df_filtrado, 'Módulo')
+    modulo_analysis = metricas[['Total', 'Tempo Médio (dias)', 'Taxa Falhas (%)', 'Taxa Conclusão (%)']].round(2)
+    modulo_analysis['Dentro Prazo (%)'] = metricas['Dentro Prazo (%)']
+    modulo_analysis.columns = ['Total', 'Tempo Médio', 'Taxa Falhas (%)', 'Taxa Conclusão (%)', 'Dentro Prazo (%)']
+    return modulo_analysis.sort_values('Total', ascending=False)
+
+# Relatório completo do dashboard (métricas do topo, abas e alertas) para uso sem Streamlit
+COLUNAS_RELATORIO_ATIVIDADES = ['ID', 'Atividade', 'Responsável', 'Módulo', 'Sprint', 'Status', 'Tempo Entrega (dias)']
+COLUNAS_RELATORIO_ALERTAS = ['ID', 'Atividade', 'Responsável', 'Módulo', 'Sprint', 'Status', 'Data Abertura',
+                             'Dias em Aberto', 'Nível Alerta']
+
+def carregar_dados(aba_manutencao, aba_controlador):
+    """
+    Lê e normaliza as duas abas; retorna (df_manutencao, df_controlador)
+    """
+    return (
+        carregar_aba(aba_manutencao, *ETAPAS_ABAS["Manutenção"]),
+        carregar_aba(aba_controlador, *ETAPAS_ABAS["Controlador"])
+    )
+
+def calcular_relatorio(df, df_controlador=None, selecoes=None, periodo=None, hoje=None, quantidade_top=5):
+    """
+    Os números do dashboard para os filtros dados, no mesmo pipeline da aplicação:
+    índice dos filtros -> agregados por célula e histogramas de tempo -> tabelas das abas -> alertas.
+    selecoes: {dimensão: [valores]}; periodo: (coluna de data, início, fim); hoje: data de
+    referência dos alertas (padrão: hoje).
+    Retorna {'resumo': {...}, 'tabelas': {nome: DataFrame}}.
+    """
+    selecoes = {dimensao: list(valores) for dimensao, valores in (selecoes or {}).items()}
+    dia_hoje = dia_inteiro(hoje) if hoje is not None else None
+
+    indice = montar_indice_filtros(df)
+    posicoes_filtradas = filtrar_posicoes(indice, selecoes, periodo)
+    df_filtrado = df.take(posicoes_filtradas)
+
+    # Métricas do topo e da barra lateral (agregados das linhas filtradas)
+    celulas = agregar_celulas(df_filtrado)
+    totais = celulas.sum()
+    total_atividades = int(totais.get('linhas', 0))
+    concluidas = int(totais.get('concluidas', 0))
+    com_falha = int(totais.get('falhas', 0))
+    com_tempo = totais.get('concluidas_com_tempo', 0)
+    resumo = {
+        'total_atividades': total_atividades,
+        'concluidas': concluidas,
+        'taxa_conclusao_pct': concluidas / total_atividades * 100 if total_atividades > 0 else None,
+        'com_falha': com_falha,
+        'taxa_falhas_pct': com_falha / total_atividades * 100 if total_atividades > 0 else 0,
+        'tempo_medio_entrega_dias': totais['soma_tempo_concluidas'] / com_tempo if com_tempo > 0 else None,
+        'prazo_gestao_dias': PRAZO_GESTAO,
+        'dentro_prazo': int(totais.get('dentro_prazo', 0)),
+        'fora_prazo': int(totais.get('fora_prazo', 0))
+    }
+    resumo['taxa_dentro_prazo_pct'] = resumo['dentro_prazo'] / concluidas * 100 if concluidas > 0 else None
+    resumo['taxa_fora_prazo_pct'] = resumo['fora_prazo'] / concluidas * 100 if concluidas > 0 else None
+
+    # Percentis do tempo de entrega (geral e por dimensão)
+    tempos = agregar_tempos(df_filtrado)
+    percentis_gerais = percentis_tempos(tempos, {})
+    for percentil in PERCENTIS_SLA:
+        coluna = f'P{percentil} (dias)'
+        resumo[f'p{percentil}_entrega_dias'] = float(percentis_gerais[coluna].iloc[0]) if not percentis_gerais.empty else None
+
+    # Todas as tabelas saem sempre, vazias (só o cabeçalho) quando o filtro não tem linhas:
+    # numa pasta de saída reaproveitada, nenhum arquivo fica com o resultado da execução anterior
+    tabelas = {}
+    tabelas['por_responsavel'] = analise_por_responsavel(df_filtrado)[0]
+    tabelas['por_modulo'] = analise_por_modulo(df_filtrado)
+    for dimensao, nome in [('Responsável', 'responsavel'), ('Módulo', 'modulo'), ('Sprint', 'sprint')]:
+        tabelas[f'percentis_por_{nome}'] = percentis_tempos(tempos, {}, dimensao).round(2)
+    evolucao = consultar_serie(agregar_serie_diaria(df_filtrado), {}, 'Mês')
+    tabelas['evolucao_mensal'] = evolucao if not evolucao.empty else pd.DataFrame(columns=['Período', 'abertas', 'entregues'])
+
+    # Rankings das atividades (mesma ordem das listas da aba de prazos)
+    rankings = montar_ordens_ranking("Manutenção", df)
+    for nome in ['mais_atrasadas', 'mais_rapidas']:
+        posicoes = primeiras_do_ranking(rankings[nome], quantidade_top, posicoes_filtradas) if nome in rankings else []
+        tabelas[nome] = df.take(posicoes).reindex(columns=COLUNAS_RELATORIO_ATIVIDADES)
+
+    # Alertas de demandas em aberto
+    df_alertas, criticos, alertas = calcular_dias_em_aberto(
+        df, montar_indice_envelhecimento(df), posicoes_filtradas, dia_hoje
+    )
+    resumo['alertas_total'] = criticos + alertas
+    resumo['alertas_criticos'] = criticos
+    resumo['alertas_atencao'] = alertas
+    tabelas['alertas'] = df_alertas.reindex(columns=COLUNAS_RELATORIO_ALERTAS)
+
+    # Controlador (sem os filtros da Manutenção, como na aba); sem a aba, tabelas vazias
+    if df_controlador is None:
+        df_controlador = normalizar_controlador(limpar_dados_controlador(
+            registros_para_dataframe(COLUNAS_DASHBOARD['Controlador'], [])
+        ))
+    resumo['controlador_demandas'] = len(df_controlador)
+    resumo['controlador_pontos'] = float(df_controlador['Pontos'].sum())
+    tabelas['controlador_por_responsavel'] = metricas_agrupadas(df_controlador, 'Responsável').round(1)
+    tabelas['controlador_por_modulo'] = metricas_agrupadas(df_controlador, 'Módulo').round(1)
+    ranking_controlador = montar_ordens_ranking("Controlador", df_controlador)
+    posicoes = primeiras_do_ranking(ranking_controlador['mais_complexas'], quantidade_top) if 'mais_complexas' in ranking_controlador else []
+    tabelas['controlador_mais_complexas'] = df_controlador.take(posicoes).reindex(
+        columns=['ID', 'Atividade', 'Pontos', 'Responsável', 'Módulo']
+    )
+
+    return {'resumo': resumo, 'tabelas': tabelas}
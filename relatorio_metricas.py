@@ -0,0 +1,150 @@
+import argparse
+import json
+import sys
+import tomllib
+from datetime import date, datetime
+from pathlib import Path
+
+import pandas as pd
+
+from metricas import (
+    COLUNAS_DATA_INDICE, configuracao_fonte, abrir_arquivo_local, abrir_gsheets, carregar_dados, calcular_relatorio
+)
+
+# Relatório diário do dashboard sem Streamlit (ex.: cron), em JSON e/ou CSV:
+#   python relatorio_metricas.py --saida relatorios --formato json csv
+#   python relatorio_metricas.py --fonte arquivo --caminho manutencao.xlsx --responsavel Danilo --inicio 2025-09-01
+# A fonte padrão é a mesma do dashboard: [fonte_dados] do secrets.toml e as variáveis FONTE_DADOS*.
+ARQUIVO_SECRETS = Path(__file__).parent / ".streamlit" / "secrets.toml"
+
+def ler_secrets(caminho):
+    """
+    Configuração do secrets.toml do Streamlit (vazia se o arquivo não existir)
+    """
+    caminho = Path(caminho)
+    if not caminho.exists():
+        return {}
+    with open(caminho, 'rb') as arquivo:
+        return tomllib.load(arquivo)
+
+def abrir_fonte(args, secrets):
+    """
+    Retorna (aba_manutencao, aba_controlador): argumentos da linha de comando têm
+    prioridade sobre as variáveis de ambiente e o secrets.toml
+    """
+    config = configuracao_fonte(dict(secrets.get("fonte_dados", {})))
+    tipo = args.fonte or config['tipo']
+    if tipo == "arquivo":
+        return abrir_arquivo_local(args.caminho or config['caminho'])
+    if tipo == "gsheets":
+        if "gcp_service_account" not in secrets:
+            raise ValueError(f"Conta de serviço [gcp_service_account] não encontrada em {args.secrets}")
+        _, _, abas = abrir_gsheets(dict(secrets["gcp_service_account"]), args.chave or config['chave_planilha'])
+        return abas["Manutenção"], abas["Controlador"]
+    raise ValueError(f"Fonte de dados desconhecida: {tipo}")
+
+def tabela_para_registros(tabela):
+    """
+    DataFrame em lista de dicionários serializável (datas ISO, vazios como null);
+    índices nomeados (ex.: Responsável) viram coluna
+    """
+    tabela = tabela.reset_index(drop=tabela.index.name is None)
+    return json.loads(tabela.to_json(orient='records', date_format='iso', force_ascii=False))
+
+def gravar_relatorio(relatorio, pasta, formatos, metadados):
+    """
+    Grava relatorio.json (tudo num arquivo) e/ou resumo.csv mais um CSV por tabela.
+    Retorna os arquivos gravados.
+    """
+    pasta = Path(pasta)
+    pasta.mkdir(parents=True, exist_ok=True)
+    gravados = []
+
+    if 'json' in formatos:
+        conteudo = {
+            **metadados,
+            'resumo': relatorio['resumo'],
+            'tabelas': {nome: tabela_para_registros(tabela) for nome, tabela in relatorio['tabelas'].items()}
+        }
+        arquivo = pasta / "relatorio.json"
+        arquivo.write_text(json.dumps(conteudo, ensure_ascii=False, indent=2, default=str), encoding='utf-8')
+        gravados.append(arquivo)
+
+    if 'csv' in formatos:
+        arquivo = pasta / "resumo.csv"
+        pd.Series(relatorio['resumo'], name='valor', dtype=object).rename_axis('metrica').to_csv(arquivo)
+        gravados.append(arquivo)
+        for nome, tabela in relatorio['tabelas'].items():
+            arquivo = pasta / f"{nome}.csv"
+            tabela.to_csv(arquivo, index=tabela.index.name is not None)
+            gravados.append(arquivo)
+
+    return gravados
+
+def montar_argumentos():
+    parser = argparse.ArgumentParser(
+        description="Calcula as métricas do dashboard de produtividade sem abrir o Streamlit "
+                    "e grava o relatório em JSON e/ou CSV."
+    )
+    fonte = parser.add_argument_group("fonte de dados")
+    fonte.add_argument("--fonte", choices=["gsheets", "arquivo"], help="padrão: a mesma do dashboard")
+    fonte.add_argument("--caminho", help="arquivo .xlsx ou pasta com manutencao/controlador (fonte arquivo)")
+    fonte.add_argument("--chave", help="chave da planilha no Google Sheets")
+    fonte.add_argument("--secrets", default=str(ARQUIVO_SECRETS), help="secrets.toml com [gcp_service_account] e [fonte_dados]")
+
+    filtros = parser.add_argument_group("filtros (repita a opção para vários valores)")
+    filtros.add_argument("--sprint", action="append", default=[])
+    filtros.add_argument("--responsavel", action="append", default=[])
+    filtros.add_argument("--modulo", action="append", default=[])
+    filtros.add_argument("--status", action="append", default=[])
+    filtros.add_argument("--coluna-data", choices=COLUNAS_DATA_INDICE, default=COLUNAS_DATA_INDICE[0],
+                         help="coluna de data do período")
+    filtros.add_argument("--inicio", type=date.fromisoformat, help="início do período (AAAA-MM-DD)")
+    filtros.add_argument("--fim", type=date.fromisoformat, help="fim do período (AAAA-MM-DD)")
+    filtros.add_argument("--hoje", type=date.fromisoformat, help="data de referência dos alertas (padrão: hoje)")
+
+    saida = parser.add_argument_group("saída")
+    saida.add_argument("--saida", default="relatorios", help="pasta dos arquivos gerados")
+    saida.add_argument("--formato", nargs="+", choices=["json", "csv"], default=["json", "csv"])
+    saida.add_argument("--top", type=int, default=5, help="tamanho das listas de atividades")
+    return parser
+
+def main(argv=None):
+    args = montar_argumentos().parse_args(argv)
+    secrets = ler_secrets(args.secrets)
+
+    try:
+        aba_manutencao, aba_controlador = abrir_fonte(args, secrets)
+        df, df_controlador = carregar_dados(aba_manutencao, aba_controlador)
+    except Exception as e:
+        print(f"❌ Erro ao carregar os dados: {e}", file=sys.stderr)
+        return 1
+
+    # Opção repetida com o mesmo valor conta uma vez só
+    selecoes = {
+        'Sprint': list(dict.fromkeys(args.sprint)),
+        'Responsável': list(dict.fromkeys(args.responsavel)),
+        'Módulo': list(dict.fromkeys(args.modulo)),
+        'Status': list(dict.fromkeys(args.status))
+    }
+    periodo = None
+    if args.inicio or args.fim:
+        periodo = (args.coluna_data, args.inicio or date.min, args.fim or date.max)
+
+    relatorio = calcular_relatorio(df, df_controlador, selecoes, periodo, hoje=args.hoje, quantidade_top=args.top)
+    metadados = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'filtros': {
+            **{dimensao: valores for dimensao, valores in selecoes.items() if valores},
+            **({'periodo': [periodo[0], periodo[1].isoformat(), periodo[2].isoformat()]} if periodo else {})
+        }
+    }
+    gravados = gravar_relatorio(relatorio, args.saida, args.formato, metadados)
+
+    resumo = relatorio['resumo']
+    print(f"✅ {resumo['total_atividades']} atividades | {resumo['alertas_criticos']} críticos, "
+          f"{resumo['alertas_atencao']} em alerta | {len(gravados)} arquivo(s) em {args.saida}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
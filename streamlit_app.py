@@ -3,12 +3,33 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
+import threading
+import time
+import heapq
+import itertools
+import sys
+from collections import OrderedDict
+import json
+import os
+import hashlib
+from pathlib import Path
 from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import gspread
-from google.oauth2.service_account import Credentials
+import requests
+from metricas import (
+    PRAZO_GESTAO, COLUNAS_DASHBOARD, PERCENTIS_SLA, ETAPAS_ABAS, DIMENSOES_FILTRO, GRANULARIDADES_SERIE,
+    configuracao_fonte, abrir_arquivo_local, abrir_gsheets, registros_para_dataframe,
+    agregar_celulas, agregar_tempos, somar_celulas, resumo_celulas, percentis_tempos,
+    converter_datas, limpar_dados_manutencao, limpar_dados_controlador,
+    normalizar_manutencao, normalizar_controlador, juntar_normalizados,
+    montar_indice_envelhecimento, calcular_dias_em_aberto,
+    montar_indice_filtros, fatia_periodo, filtrar_posicoes, contagens_facetas,
+    montar_ordens_ranking, primeiras_do_ranking, agregar_serie_diaria, montar_series_diarias, consultar_serie,
+    metricas_agrupadas, analise_por_responsavel, analise_por_modulo
+)
 
 # Configuração da página
 st.set_page_config(
@@ -112,23 +133,930 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Agendador das chamadas à API do Google Sheets, compartilhado por todas as sessões:
+# balde de fichas na cota por minuto, prioridade por tipo de chamada e leituras idênticas agrupadas
+COTA_POR_MINUTO = 60  # cota padrão de requisições por minuto por usuário do Sheets
+RAJADA_MAXIMA = 10  # fichas acumuladas no máximo (chamadas seguidas sem espera)
+PRIORIDADE_ESCRITA = 0  # inserções dos formulários, importação e fila de envios
+PRIORIDADE_SESSAO = 1  # leituras pedidas por um usuário na página
+PRIORIDADE_SEGUNDO_PLANO = 2  # atualizador periódico
+THREADS_SEGUNDO_PLANO = {"atualizador-dados"}
+
+@st.cache_resource
+def agendador_api():
+    """
+    Estado do agendador: fichas disponíveis, fila de espera por prioridade,
+    leituras em andamento (para agrupar pedidos iguais) e métricas
+    """
+    return {
+        'condicao': threading.Condition(),
+        'fichas': float(RAJADA_MAXIMA),
+        'reposto_em': time.monotonic(),
+        'fila': [],
+        'sequencia': itertools.count(),
+        'em_andamento': {},
+        'metricas': {'chamadas': 0, 'na_fila': 0, 'esperas_por_cota': 0, 'leituras_agrupadas': 0, 'erros_cota': 0}
+    }
+
+def prioridade_da_thread():
+    if threading.current_thread().name in THREADS_SEGUNDO_PLANO:
+        return PRIORIDADE_SEGUNDO_PLANO
+    return PRIORIDADE_SESSAO
+
+def obter_ficha(agendador, prioridade):
+    """
+    Espera a vez (menor prioridade primeiro, depois ordem de chegada) e uma ficha livre
+    """
+    taxa = COTA_POR_MINUTO / 60
+    with agendador['condicao']:
+        minha_vez = (prioridade, next(agendador['sequencia']))
+        heapq.heappush(agendador['fila'], minha_vez)
+        agendador['metricas']['na_fila'] = len(agendador['fila'])
+        esperou = False
+        while True:
+            agora = time.monotonic()
+            agendador['fichas'] = min(RAJADA_MAXIMA, agendador['fichas'] + (agora - agendador['reposto_em']) * taxa)
+            agendador['reposto_em'] = agora
+            primeiro = agendador['fila'][0] == minha_vez
+            if primeiro and agendador['fichas'] >= 1:
+                break
+            esperou = True
+            # Só o primeiro da fila espera a próxima ficha; os demais esperam a vez
+            agendador['condicao'].wait((1 - agendador['fichas']) / taxa if primeiro else None)
+        heapq.heappop(agendador['fila'])
+        agendador['fichas'] -= 1
+        agendador['metricas']['na_fila'] = len(agendador['fila'])
+        agendador['metricas']['chamadas'] += 1
+        if esperou:
+            agendador['metricas']['esperas_por_cota'] += 1
+        agendador['condicao'].notify_all()
+
+def chamar_api(funcao, *args, prioridade=None, chave=None, **kwargs):
+    """
+    Executa uma chamada do gspread pelo agendador. Com `chave`, pedidos idênticos feitos
+    ao mesmo tempo viram uma chamada só e todos recebem a mesma resposta.
+    """
+    agendador = agendador_api()
+    if prioridade is None:
+        prioridade = prioridade_da_thread()
+
+    pedido = None
+    if chave is not None:
+        with agendador['condicao']:
+            pedido = agendador['em_andamento'].get(chave)
+            if pedido is not None:
+                agendador['metricas']['leituras_agrupadas'] += 1
+            else:
+                agendador['em_andamento'][chave] = {'pronto': threading.Event(), 'resultado': None, 'erro': None}
+        if pedido is not None:
+            pedido['pronto'].wait()
+            if pedido['erro'] is not None:
+                raise pedido['erro']
+            return pedido['resultado']
+        pedido = agendador['em_andamento'][chave]
+
+    try:
+        obter_ficha(agendador, prioridade)
+        resultado = funcao(*args, **kwargs)
+        if pedido is not None:
+            pedido['resultado'] = resultado
+        return resultado
+    except Exception as e:
+        if isinstance(e, gspread.exceptions.APIError) and e.response.status_code == 429:
+            # Cota estourada mesmo assim (outros clientes na mesma conta): zera as fichas
+            with agendador['condicao']:
+                agendador['metricas']['erros_cota'] += 1
+                agendador['fichas'] = 0
+        if pedido is not None:
+            pedido['erro'] = e
+        raise
+    finally:
+        if pedido is not None:
+            with agendador['condicao']:
+                agendador['em_andamento'].pop(chave, None)
+            pedido['pronto'].set()
+
+# Cliente gspread compartilhado por todo o processo (todas as sessões)
+@st.cache_resource
+def conexao_gsheets():
+    """
+    Autoriza uma única vez e guarda cliente, planilha e abas.
+    A sessão HTTP e o token são reaproveitados; o google-auth só renova
+    as credenciais quando o token expira.
+    """
+    client, planilha, abas = abrir_gsheets(
+        st.secrets["gcp_service_account"], configuracao_fonte_dados()['chave_planilha'], chamar=chamar_api
+    )
+    return {'client': client, 'planilha': planilha, 'abas': abas}
+
+# Configurar conexão com Google Sheets (reaproveita a conexão do processo)
+def setup_gsheets():
+    abas = conexao_gsheets()['abas']
+    return abas["Manutenção"], abas["Controlador"]
+
+@st.cache_resource
+def setup_arquivo_local(caminho):
+    return abrir_arquivo_local(caminho)
+
+# Configuração da fonte de dados: [fonte_dados] no secrets.toml ou variáveis de ambiente
+def configuracao_fonte_dados():
+    """
+    Retorna {'tipo': 'gsheets' | 'arquivo', 'caminho': ..., 'chave_planilha': ...}.
+    As variáveis FONTE_DADOS, FONTE_DADOS_CAMINHO e FONTE_DADOS_CHAVE têm prioridade sobre o secrets.toml.
+    """
+    try:
+        config = dict(st.secrets.get("fonte_dados", {}))
+    except Exception:
+        config = {}
+    return configuracao_fonte(config)
+
+def ler_intervalos_em_lote(pedidos):
+    """
+    Lê vários intervalos [(aba, "A2:C"), ...] de uma vez, com valores não formatados
+    (números como números e datas como número de série). No Google Sheets é uma
+    única chamada values_batch_get por planilha. Retorna as linhas de cada pedido, na ordem.
+    """
+    resultados = [None] * len(pedidos)
+    por_planilha = {}
+    for posicao, (aba, intervalo) in enumerate(pedidos):
+        if isinstance(aba, gspread.Worksheet):
+            por_planilha.setdefault(aba.spreadsheet.id, (aba.spreadsheet, []))[1].append((posicao, aba, intervalo))
+        else:
+            resultados[posicao] = aba.get_values(intervalo)
+
+    for planilha, itens in por_planilha.values():
+        intervalos = [f"'{aba.title}'!{intervalo}" for _, aba, intervalo in itens]
+        resposta = chamar_api(
+            planilha.values_batch_get,
+            intervalos,
+            params={'valueRenderOption': 'UNFORMATTED_VALUE', 'dateTimeRenderOption': 'SERIAL_NUMBER'},
+            chave=('values_batch_get', planilha.id, tuple(intervalos))
+        )
+        for (posicao, _, _), faixa in zip(itens, resposta.get('valueRanges', [])):
+            resultados[posicao] = faixa.get('values', [])
+
+    return resultados
+
+def descricao_fonte_dados():
+    config = configuracao_fonte_dados()
+    if config['tipo'] == "arquivo":
+        return f"arquivo local ({Path(config['caminho']).name})"
+    return "Google Sheets"
+
+def abrir_fonte_dados():
+    """
+    Retorna (aba_manutencao, aba_controlador) da fonte configurada
+    """
+    config = configuracao_fonte_dados()
+    if config['tipo'] == "arquivo":
+        return setup_arquivo_local(config['caminho'])
+    if config['tipo'] == "gsheets":
+        return setup_gsheets()
+    raise ValueError(f"Fonte de dados desconhecida: {config['tipo']}")
+
+# Modo de sincronização: "incremental" lê só as linhas novas de cada aba,
+# "completa" baixa a aba inteira a cada atualização
+MODO_SINCRONIZACAO = "incremental"
+
+# Estado da sincronização incremental (compartilhado entre sessões)
+@st.cache_resource
+def estado_sincronizacao():
+    """
+    Guarda, por aba, o cabeçalho, a última linha lida e o DataFrame acumulado,
+    além das linhas recém-registradas que ainda não voltaram da planilha
+    """
+    return {
+        'lock': threading.Lock(),  # leitura/troca dos DataFrames (rápido)
+        'lock_sincronizacao': threading.Lock(),  # uma sincronização com a fonte por vez
+        'lock_provisorias': threading.Lock(),  # uma junção de linhas provisórias por vez (fora do lock de leitura)
+        'abas': {},
+        'provisorias': {},  # por aba: linhas normalizadas gravadas pelo formulário (write-through)
+        'versao': 0,
+        'atualizado_em': None
+    }
+
+def faixas_de_colunas(cabecalho, colunas_usadas):
+    """
+    Agrupa as colunas usadas em faixas contíguas de índices, ex.: [(0, 2), (5, 7)]
+    """
+    faixas = []
+    for indice, nome in enumerate(cabecalho):
+        if colunas_usadas is not None and nome not in colunas_usadas:
+            continue
+        if faixas and faixas[-1][1] == indice - 1:
+            faixas[-1] = (faixas[-1][0], indice)
+        else:
+            faixas.append((indice, indice))
+    return faixas
+
+def intervalo_a1(faixa, linha_inicial):
+    inicio = gspread.utils.rowcol_to_a1(linha_inicial, faixa[0] + 1)
+    fim = gspread.utils.rowcol_to_a1(1, faixa[1] + 1)[:-1]
+    return f"{inicio}:{fim}"
+
+def celulas_da_aba(estado_aba):
+    """
+    Agregados por célula de uma aba do estado (montados do zero se ainda não existirem)
+    """
+    if 'celulas' in estado_aba:
+        return estado_aba['celulas']
+    return agregar_celulas(estado_aba['df'])
+
+def tempos_da_aba(estado_aba):
+    """
+    Histogramas do tempo de entrega de uma aba do estado (montados do zero se ainda não existirem)
+    """
+    if 'tempos' in estado_aba:
+        return estado_aba['tempos']
+    return agregar_tempos(estado_aba['df'])
+
+def valor_id(valor):
+    """
+    ID de uma célula como texto comparável (41, 41.0 e '41' são o mesmo ID)
+    """
+    numero = pd.to_numeric(pd.Series([valor], dtype=object), errors='coerce').iloc[0]
+    if pd.isna(numero):
+        return '' if valor is None else str(valor).strip()
+    return str(int(numero)) if float(numero).is_integer() else str(numero)
+
+def sincronizar_abas(abas, completa=False):
+    """
+    Sincroniza as abas [(aba, limpar_dados, normalizar_dados), ...] numa única leitura em lote,
+    só com as colunas usadas pelo dashboard. Na primeira vez (ou em modo completo)
+    lê tudo; depois busca apenas as linhas após a última já ingerida.
+    As linhas novas passam por limpar_dados e normalizar_dados (tipos e categorias
+    finais, linha a linha) e são acrescentadas ao DataFrame acumulado sem renormalizá-lo.
+    Na mesma leitura vem o ID da última linha já ingerida: se não for o que foi lido
+    antes (linha apagada ou movida acima dela), as abas são relidas por inteiro.
+    Quem chama deve segurar estado['lock_sincronizacao']; a leitura na API acontece
+    fora do lock de leitura, e os DataFrames novos entram numa troca atômica no fim.
+    Retorna os DataFrames acumulados, na mesma ordem.
+    """
+    estado = estado_sincronizacao()
+    with estado['lock']:
+        estados_abas = []
+        for aba, _, _ in abas:
+            estado_aba = estado['abas'].get(aba.title)
+            if completa or MODO_SINCRONIZACAO != "incremental" or (estado_aba and not estado_aba['cabecalho']):
+                estado_aba = None
+            estados_abas.append(estado_aba)
+
+    # Sincronização completa precisa do cabeçalho antes (uma chamada leve, em lote)
+    abas_sem_cabecalho = [aba for (aba, _, _), estado_aba in zip(abas, estados_abas) if estado_aba is None]
+    linhas_cabecalho = ler_intervalos_em_lote([(aba, "1:1") for aba in abas_sem_cabecalho]) if abas_sem_cabecalho else []
+    cabecalhos = {
+        aba.title: [str(nome) for nome in (linhas[0] if linhas else [])]
+        for aba, linhas in zip(abas_sem_cabecalho, linhas_cabecalho)
+    }
+
+    # Monta todos os intervalos projetados das abas e lê tudo numa chamada só
+    planos = []
+    pedidos = []
+    for (aba, _, _), estado_aba in zip(abas, estados_abas):
+        if estado_aba is None:
+            cabecalho = cabecalhos[aba.title]
+            linha_inicial = 2
+        else:
+            cabecalho = estado_aba['cabecalho']
+            linha_inicial = estado_aba['ultima_linha'] + 1
+        faixas = faixas_de_colunas(cabecalho, COLUNAS_DASHBOARD.get(aba.title))
+        planos.append((cabecalho, linha_inicial, faixas, len(pedidos)))
+        pedidos.extend((aba, intervalo_a1(faixa, linha_inicial)) for faixa in faixas)
+    # Conferência: a célula de ID da última linha ingerida, uma por aba incremental
+    conferencias = []
+    for (aba, _, _), estado_aba in zip(abas, estados_abas):
+        if estado_aba is not None and estado_aba.get('id_ultima_linha') is not None:
+            letra = gspread.utils.rowcol_to_a1(1, estado_aba['cabecalho'].index('ID') + 1)[:-1]
+            conferencias.append((estado_aba, len(pedidos)))
+            pedidos.append((aba, f"{letra}{estado_aba['ultima_linha']}"))
+    respostas = ler_intervalos_em_lote(pedidos) if pedidos else []
+
+    for estado_aba, posicao in conferencias:
+        celula = respostas[posicao]
+        if valor_id(celula[0][0] if celula and celula[0] else '') != estado_aba['id_ultima_linha']:
+            # Linhas já ingeridas mudaram de lugar: a leitura só do fim perderia ou repetiria linhas
+            return sincronizar_abas(abas, completa=True)
+
+    novos_estados = {}
+    houve_mudanca = False
+    for (aba, limpar_dados, normalizar_dados), estado_aba, plano in zip(abas, estados_abas, planos):
+        cabecalho, linha_inicial, faixas, posicao = plano
+        blocos = respostas[posicao:posicao + len(faixas)]
+
+        # Junta as faixas lado a lado (cada faixa pode vir com menos linhas no fim)
+        total_linhas = max((len(bloco) for bloco in blocos), default=0)
+        colunas = [cabecalho[indice] for inicio, fim in faixas for indice in range(inicio, fim + 1)]
+        linhas = []
+        for numero in range(total_linhas):
+            linha = []
+            for (inicio, fim), bloco in zip(faixas, blocos):
+                valores = bloco[numero] if numero < len(bloco) else []
+                linha.extend(valores + [''] * (fim - inicio + 1 - len(valores)))
+            linhas.append(linha)
+
+        df_novo = limpar_dados(registros_para_dataframe(colunas, linhas))
+        if 'ID' not in colunas:
+            id_ultima_linha = None
+        elif linhas:
+            id_ultima_linha = valor_id(linhas[-1][colunas.index('ID')])
+        else:
+            id_ultima_linha = estado_aba.get('id_ultima_linha') if estado_aba is not None else None
+
+        if estado_aba is None:
+            df_total = normalizar_dados(df_novo)
+            celulas = agregar_celulas(df_total)
+            tempos = agregar_tempos(df_total)
+            houve_mudanca = True
+        elif df_novo.empty:
+            df_total = estado_aba['df']
+            celulas = celulas_da_aba(estado_aba)
+            tempos = tempos_da_aba(estado_aba)
+        else:
+            df_linhas_novas = normalizar_dados(df_novo)
+            df_total = juntar_normalizados(estado_aba['df'], df_linhas_novas)
+            # Agregados: só as linhas novas entram na soma
+            celulas = somar_celulas(celulas_da_aba(estado_aba), agregar_celulas(df_linhas_novas))
+            tempos = somar_celulas(tempos_da_aba(estado_aba), agregar_tempos(df_linhas_novas))
+            houve_mudanca = True
+
+        novos_estados[aba.title] = {
+            'cabecalho': cabecalho,
+            'ultima_linha': linha_inicial - 1 + total_linhas,
+            'id_ultima_linha': id_ultima_linha,
+            'df': df_total,
+            'celulas': celulas,
+            'tempos': tempos
+        }
+
+    with estado['lock_provisorias']:
+        # Linhas provisórias que já chegaram da planilha saem; as demais continuam visíveis.
+        # A junção roda fora do lock de leitura, que as sessões usam
+        restantes = {}
+        for aba, _, _ in abas:
+            provisorias = estado['provisorias'].get(aba.title)
+            if provisorias is not None:
+                restantes[aba.title], exibicao = mesclar_provisorias(novos_estados[aba.title], provisorias)
+                novos_estados[aba.title].update(exibicao)
+
+        # Troca atômica: as sessões passam a ver a nova versão de uma vez
+        with estado['lock']:
+            for nome_aba, provisorias in restantes.items():
+                if provisorias is None:
+                    estado['provisorias'].pop(nome_aba, None)
+                else:
+                    estado['provisorias'][nome_aba] = provisorias
+            estado['abas'] = {**estado['abas'], **novos_estados}
+            if houve_mudanca:
+                estado['versao'] += 1
+            estado['atualizado_em'] = datetime.now()
+
+    return [novos_estados[aba.title]['df'] for aba, _, _ in abas]
+
+# Snapshot local em Parquet para partidas a frio instantâneas
+PASTA_SNAPSHOT = Path(__file__).parent / "dados_snapshot"
+ARQUIVOS_SNAPSHOT = {'Manutenção': 'manutencao.parquet', 'Controlador': 'controlador.parquet'}
+
+def salvar_snapshot(estado, dados_mudaram=True):
+    """
+    Grava as abas sincronizadas em Parquet e os metadados (versão, data, última linha) em JSON
+    """
+    PASTA_SNAPSHOT.mkdir(exist_ok=True)
+    metadados = {
+        'fonte': configuracao_fonte_dados(),
+        'versao': estado['versao'],
+        'atualizado_em': estado['atualizado_em'].isoformat(),
+        'abas': {}
+    }
+    for nome, estado_aba in estado['abas'].items():
+        arquivo = ARQUIVOS_SNAPSHOT.get(nome, f"{nome}.parquet")
+        if dados_mudaram:
+            df_snapshot = estado_aba['df'].copy()
+            # Parquet não aceita colunas com tipos misturados (ex.: números e '')
+            for coluna in df_snapshot.columns:
+                if df_snapshot[coluna].dtype == object:
+                    df_snapshot[coluna] = df_snapshot[coluna].astype(str)
+            df_snapshot.to_parquet(PASTA_SNAPSHOT / f"{arquivo}.tmp", index=False)
+            os.replace(PASTA_SNAPSHOT / f"{arquivo}.tmp", PASTA_SNAPSHOT / arquivo)
+        metadados['abas'][nome] = {
+            'arquivo': arquivo,
+            'cabecalho': estado_aba['cabecalho'],
+            'ultima_linha': estado_aba['ultima_linha'],
+            'id_ultima_linha': estado_aba.get('id_ultima_linha')
+        }
+
+    # Metadados por último: só apontam para arquivos já gravados
+    caminho_tmp = PASTA_SNAPSHOT / "metadados.json.tmp"
+    with open(caminho_tmp, 'w', encoding='utf-8') as arquivo_meta:
+        json.dump(metadados, arquivo_meta, ensure_ascii=False)
+    os.replace(caminho_tmp, PASTA_SNAPSHOT / "metadados.json")
+
+def semear_estado_com_snapshot():
+    """
+    Na partida a frio, carrega o snapshot local no estado de sincronização.
+    Retorna True se o estado foi preenchido a partir do disco.
+    """
+    estado = estado_sincronizacao()
+    with estado['lock']:
+        if estado['abas'] or estado.get('snapshot_verificado'):
+            return False
+        estado['snapshot_verificado'] = True
+        try:
+            with open(PASTA_SNAPSHOT / "metadados.json", encoding='utf-8') as arquivo_meta:
+                metadados = json.load(arquivo_meta)
+            # Snapshot de outra fonte de dados não serve de base para a sincronização
+            if metadados.get('fonte') != configuracao_fonte_dados():
+                return False
+            abas = {}
+            for nome, info_aba in metadados['abas'].items():
+                df_snapshot = pd.read_parquet(PASTA_SNAPSHOT / info_aba['arquivo'])
+                if nome == "Manutenção":
+                    df_snapshot = normalizar_manutencao(df_snapshot)
+                elif nome == "Controlador":
+                    df_snapshot = normalizar_controlador(df_snapshot)
+                abas[nome] = {
+                    'cabecalho': info_aba['cabecalho'],
+                    'ultima_linha': info_aba['ultima_linha'],
+                    'id_ultima_linha': info_aba.get('id_ultima_linha'),
+                    'df': df_snapshot,
+                    'celulas': agregar_celulas(df_snapshot),
+                    'tempos': agregar_tempos(df_snapshot)
+                }
+        except Exception:
+            # Sem snapshot (ou snapshot corrompido): segue com a carga normal
+            return False
+
+        estado['abas'] = abas
+        estado['versao'] = metadados['versao']
+        estado['atualizado_em'] = datetime.fromisoformat(metadados['atualizado_em'])
+        return True
+
+def dados_do_estado():
+    """
+    Retorna os DataFrames do estado de sincronização e as informações de versão.
+    Os DataFrames são os mesmos de todas as sessões (sem cópia: não alterar); cada
+    sincronização troca os objetos inteiros, então a versão em uso não muda por baixo.
+    """
+    estado = estado_sincronizacao()
+    with estado['lock']:
+        if 'Manutenção' not in estado['abas'] or 'Controlador' not in estado['abas']:
+            return None, None, None
+        df_principal = estado['abas']['Manutenção'].get('df_exibicao', estado['abas']['Manutenção']['df'])
+        df_controlador = estado['abas']['Controlador'].get('df_exibicao', estado['abas']['Controlador']['df'])
+        info_dados = {
+            'versao': estado['versao'],
+            'atualizado_em': estado['atualizado_em'],
+            # Agregados por célula da versão exibida (sem cópia: não alterar)
+            'celulas': {
+                nome: estado_aba.get('celulas_exibicao', celulas_da_aba(estado_aba))
+                for nome, estado_aba in estado['abas'].items()
+            },
+            # Histogramas do tempo de entrega da versão exibida (idem)
+            'tempos': {
+                nome: estado_aba.get('tempos_exibicao', tempos_da_aba(estado_aba))
+                for nome, estado_aba in estado['abas'].items()
+            }
+        }
+    return df_principal, df_controlador, info_dados
+
+def sincronizar_fonte_dados(completa=False):
+    """
+    Sincroniza as duas abas com a fonte configurada e grava o snapshot local.
+    Não usa elementos do Streamlit: roda tanto na sessão quanto no atualizador em segundo plano.
+    """
+    estado = estado_sincronizacao()
+    # Conectar com as abas da fonte configurada (Google Sheets ou arquivo local)
+    aba_manutencao, aba_controlador = abrir_fonte_dados()
+
+    with estado['lock_sincronizacao']:
+        versao_anterior = estado['versao']
+
+        # Carregar ABA MANUTENÇÃO (sua aba principal) e ABA CONTROLADOR numa leitura em lote,
+        # só as linhas novas e só as colunas usadas
+        sincronizar_abas([
+            (aba_manutencao, limpar_dados_manutencao, normalizar_manutencao),
+            (aba_controlador, limpar_dados_controlador, normalizar_controlador)
+        ], completa=completa)
+
+        # Gravar o snapshot local com a versão e o horário reais dos dados
+        try:
+            salvar_snapshot(estado, dados_mudaram=estado['versao'] != versao_anterior)
+            estado['aviso_snapshot'] = None
+        except Exception as e:
+            estado['aviso_snapshot'] = f"Não foi possível salvar o snapshot local: {e}"
+
+def mesclar_provisorias(estado_aba, provisorias):
+    """
+    Descarta as linhas provisórias cujo ID já está nos dados sincronizados e monta o
+    DataFrame e as células de exibição (sincronizado + provisórias restantes).
+    Não mexe no estado: roda fora do lock de leitura, e quem chama faz a troca.
+    Retorna (provisórias restantes ou None, campos de exibição da aba).
+    """
+    df_sincronizado = estado_aba['df']
+    celulas = celulas_da_aba(estado_aba)
+    tempos = tempos_da_aba(estado_aba)
+    provisorias = provisorias[~provisorias['ID'].isin(df_sincronizado['ID'].dropna())]
+    if provisorias.empty:
+        return None, {'df_exibicao': df_sincronizado, 'celulas_exibicao': celulas, 'tempos_exibicao': tempos}
+    # As provisórias já estão normalizadas: o histórico sincronizado só é acrescentado
+    return provisorias, {
+        'df_exibicao': juntar_normalizados(df_sincronizado, provisorias),
+        'celulas_exibicao': somar_celulas(celulas, agregar_celulas(provisorias)),
+        'tempos_exibicao': somar_celulas(tempos, agregar_tempos(provisorias))
+    }
+
+def incorporar_linhas_ao_estado(nome_aba, linhas):
+    """
+    Write-through: as linhas recém-registradas entram limpas e normalizadas nos dados da aba
+    e a versão sobe na hora, sem recarregar a planilha. Elas ficam como provisórias até
+    a sincronização trazer as linhas reais (mesmo ID), que as substituem.
+    Só as linhas novas são normalizadas, e a junção acontece fora do lock de leitura.
+    """
+    estado = estado_sincronizacao()
+    limpar_dados, normalizar_dados = ETAPAS_ABAS[nome_aba]
+    with estado['lock']:
+        estado_aba = estado['abas'].get(nome_aba)
+        if not estado_aba or not estado_aba['cabecalho']:
+            # Ainda não há dados carregados: a próxima carga já traz a linha
+            return False
+        cabecalho = estado_aba['cabecalho']
+
+    # A linha segue a ordem das colunas da planilha; projeta como na sincronização
+    colunas_usadas = COLUNAS_DASHBOARD.get(nome_aba)
+    colunas = [coluna for coluna in cabecalho if colunas_usadas is None or coluna in colunas_usadas]
+    registros = [dict(zip(cabecalho, linha)) for linha in linhas]
+    df_linhas = normalizar_dados(limpar_dados(registros_para_dataframe(
+        colunas, [[registro.get(coluna, '') for coluna in colunas] for registro in registros]
+    )))
+
+    with estado['lock_provisorias']:
+        with estado['lock']:
+            estado_aba = estado['abas'][nome_aba]
+            anteriores = estado['provisorias'].get(nome_aba)
+        provisorias = df_linhas if anteriores is None else juntar_normalizados(anteriores, df_linhas)
+        provisorias, exibicao = mesclar_provisorias(estado_aba, provisorias)
+
+        with estado['lock']:
+            if provisorias is None:
+                estado['provisorias'].pop(nome_aba, None)
+            else:
+                estado['provisorias'][nome_aba] = provisorias
+            estado['abas'] = {**estado['abas'], nome_aba: {**estado_aba, **exibicao}}
+            estado['versao'] += 1
+    return True
+
+# Carregar dados da fonte configurada (Google Sheets ou arquivo local) - bloqueia a sessão,
+# usado só quando ainda não há nenhuma versão dos dados para exibir
+def load_data_from_google_sheets():
+    try:
+        sincronizar_fonte_dados()
+        st.success(f"✅ Dados carregados do {descricao_fonte_dados()} com sucesso!")
+        return dados_do_estado()
+        
+    except Exception as e:
+        if erro_temporario(e):
+            st.warning(f"⏳ O {descricao_fonte_dados()} está ocupado ou fora do ar no momento. "
+                       "Tente novamente em instantes.")
+        else:
+            st.error(f"❌ Erro ao carregar dados do {descricao_fonte_dados()}: {e}")
+        return None, None, None
+
+# Intervalo do atualizador em segundo plano (mesmos 5 minutos do antigo cache)
+INTERVALO_ATUALIZACAO = 300
+# A cada tantos ciclos o atualizador relê as abas inteiras (1 hora): a leitura incremental
+# só traz linhas novas, e edições em linhas já ingeridas (status, datas, responsável) só chegam assim
+CICLOS_SINCRONIZACAO_COMPLETA = 12
+
+@st.cache_resource
+def atualizador_dados():
+    """
+    Atualizador em segundo plano (stale-while-revalidate): uma thread daemon por processo
+    recarrega os dados no intervalo configurado ou quando alguém pede. Enquanto isso as
+    sessões continuam servindo a versão anterior, trocada atomicamente no fim da sincronização.
+    """
+    atualizador = {
+        'status': 'aguardando',
+        'ultimo_erro': None,
+        'ultima_execucao': None,
+        'sincronizacao_completa': False,
+        'ciclos': 0,
+        'acordar': threading.Event()
+    }
+
+    def executar():
+        while True:
+            atualizador['acordar'].wait(INTERVALO_ATUALIZACAO)
+            atualizador['acordar'].clear()
+            atualizador['ciclos'] += 1
+            completa = atualizador['sincronizacao_completa'] or atualizador['ciclos'] % CICLOS_SINCRONIZACAO_COMPLETA == 0
+            atualizador['sincronizacao_completa'] = False
+            atualizador['status'] = 'atualizando'
+            try:
+                sincronizar_fonte_dados(completa=completa)
+                atualizador['status'] = 'ok'
+                atualizador['ultimo_erro'] = None
+            except Exception as e:
+                atualizador['status'] = 'erro'
+                atualizador['ultimo_erro'] = str(e)
+            atualizador['ultima_execucao'] = datetime.now()
+
+    atualizador['thread'] = threading.Thread(target=executar, name="atualizador-dados", daemon=True)
+    atualizador['thread'].start()
+    return atualizador
+
+def solicitar_atualizacao(completa=False):
+    """
+    Pede ao atualizador em segundo plano uma sincronização imediata, sem bloquear a sessão
+    """
+    atualizador = atualizador_dados()
+    if completa:
+        atualizador['sincronizacao_completa'] = True
+    atualizador['acordar'].set()
+
+# Alocação de IDs para novas atividades, só com o estado local (sem chamar a planilha)
+@st.cache_resource
+def alocador_ids():
+    """
+    Último ID entregue por aba neste processo, protegido por lock
+    """
+    return {'lock': threading.Lock(), 'ultimo_id': {}}
+
+def alocar_ids(nome_aba, quantidade=1, maior_id_gravado=0):
+    """
+    Reserva os próximos IDs da aba sem ler a planilha: parte do maior ID entre os dados
+    sincronizados, os envios ainda na fila e o último ID entregue neste processo.
+    Se outro processo gravar o mesmo ID nesse meio-tempo, a fila troca o ID antes do envio.
+    O lock garante IDs únicos para envios simultâneos.
+    """
+    estado = estado_sincronizacao()
+    with estado['lock']:
+        estado_aba = estado['abas'].get(nome_aba)
+    ids_sincronizados = estado_aba['df']['ID'] if estado_aba and 'ID' in estado_aba['df'].columns else pd.Series(dtype='Int64')
+    maior_id = max(maior_id_gravado, int(ids_sincronizados.max()) if ids_sincronizados.notna().any() else 0)
+
+    alocador = alocador_ids()
+    with alocador['lock']:
+        # IDs de linhas que ainda estão na fila local de envios
+        fila = fila_envios()
+        with fila['lock']:
+            ids_pendentes = [entrada['linha'][0] for entrada in fila['pendentes'] if entrada['aba'] == nome_aba]
+        maior_id = max([maior_id] + [int(valor) for valor in ids_pendentes])
+
+        primeiro_id = max(maior_id, alocador['ultimo_id'].get(nome_aba, 0)) + 1
+        alocador['ultimo_id'][nome_aba] = primeiro_id + quantidade - 1
+        return list(range(primeiro_id, primeiro_id + quantidade))
+
+def alocar_id(nome_aba):
+    return alocar_ids(nome_aba)[0]
+
+def atividades_gravadas(nome_aba, aba):
+    """
+    Atividade de cada ID já gravado na aba: dados sincronizados mais as linhas gravadas
+    depois da última sincronizada (lê só as colunas ID e Atividade desse trecho)
+    """
+    estado = estado_sincronizacao()
+    with estado['lock']:
+        estado_aba = estado['abas'].get(nome_aba)
+
+    gravadas = {}
+    if estado_aba and 'ID' in estado_aba['cabecalho'] and 'Atividade' in estado_aba['cabecalho']:
+        df_sincronizado = estado_aba['df']
+        com_id = df_sincronizado[df_sincronizado['ID'].notna()]
+        gravadas = dict(zip(com_id['ID'].astype(int), com_id['Atividade'].astype(str).str.strip()))
+        cabecalho = estado_aba['cabecalho']
+        linha_inicial = estado_aba['ultima_linha'] + 1
+    else:
+        # Sem dados sincronizados: lê as colunas desde o começo, no layout padrão da aba
+        cabecalho = COLUNAS_DASHBOARD[nome_aba]
+        linha_inicial = 2
+
+    coluna_id, coluna_atividade = cabecalho.index('ID'), cabecalho.index('Atividade')
+    primeira, ultima = min(coluna_id, coluna_atividade), max(coluna_id, coluna_atividade)
+    letra_inicial = gspread.utils.rowcol_to_a1(1, primeira + 1)[:-1]
+    letra_final = gspread.utils.rowcol_to_a1(1, ultima + 1)[:-1]
+    linhas_novas = ler_intervalos_em_lote([(aba, f"{letra_inicial}{linha_inicial}:{letra_final}")])[0]
+
+    for linha in linhas_novas:
+        linha = list(linha) + [''] * (ultima - primeira + 1 - len(linha))
+        id_gravado = pd.to_numeric(linha[coluna_id - primeira], errors='coerce')
+        if pd.notna(id_gravado):
+            gravadas[int(id_gravado)] = str(linha[coluna_atividade - primeira]).strip()
+    return gravadas
+
+def conferir_ids(nome_aba, aba, linhas):
+    """
+    Confere os IDs das linhas com os já gravados na aba, logo antes do envio.
+    ID gravado com a mesma atividade: a linha já está na planilha (ex.: queda entre o envio
+    e a limpeza da fila). ID gravado com outra atividade: o ID foi tomado por outro processo
+    e a linha recebe o próximo ID livre (alterado na própria linha).
+    Retorna (linhas a enviar, linhas já gravadas).
+    """
+    gravadas = atividades_gravadas(nome_aba, aba)
+    a_enviar, ja_gravadas, em_conflito = [], [], []
+    for linha in linhas:
+        atividade = gravadas.get(int(linha[0]))
+        if atividade is None:
+            a_enviar.append(linha)
+        elif atividade == str(linha[1]).strip():
+            ja_gravadas.append(linha)
+        else:
+            em_conflito.append(linha)
+            a_enviar.append(linha)
+
+    if em_conflito:
+        novos_ids = alocar_ids(nome_aba, len(em_conflito), maior_id_gravado=max(gravadas))
+        for linha, novo_id in zip(em_conflito, novos_ids):
+            linha[0] = novo_id
+    return a_enviar, ja_gravadas
+
+# Fila local de envios (write-behind): o formulário grava aqui e responde na hora,
+# e uma thread envia as linhas em lote para a planilha
+PASTA_FILA = Path(__file__).parent / "fila_envios"
+ARQUIVO_FILA = PASTA_FILA / "pendentes.jsonl"
+ESPERA_LOTE = 2  # segundos para juntar envios que chegam ao mesmo tempo
+TAMANHO_LOTE_ENVIO = 500  # linhas por chamada append_rows
+ESPERA_MAXIMA_NOVA_TENTATIVA = 300
+
+def ler_fila_do_disco():
+    """
+    Envios pendentes gravados no disco (sobrevivem a reinícios do processo)
+    """
+    if not ARQUIVO_FILA.exists():
+        return []
+    pendentes = []
+    with open(ARQUIVO_FILA, encoding='utf-8') as arquivo_fila:
+        for linha in arquivo_fila:
+            linha = linha.strip()
+            if not linha:
+                continue
+            try:
+                pendentes.append(json.loads(linha))
+            except json.JSONDecodeError:
+                # Linha incompleta (queda no meio da gravação)
+                continue
+    return pendentes
+
+def gravar_fila_no_disco(pendentes):
+    """
+    Regrava a fila inteira de forma atômica (usado depois de cada lote enviado)
+    """
+    PASTA_FILA.mkdir(exist_ok=True)
+    caminho_tmp = ARQUIVO_FILA.with_suffix('.tmp')
+    with open(caminho_tmp, 'w', encoding='utf-8') as arquivo_fila:
+        for entrada in pendentes:
+            arquivo_fila.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+        arquivo_fila.flush()
+        os.fsync(arquivo_fila.fileno())
+    os.replace(caminho_tmp, ARQUIVO_FILA)
+
+def erro_temporario(erro):
+    """
+    Erros que valem nova tentativa com espera: cota (429), 5xx e falhas de rede
+    """
+    if isinstance(erro, gspread.exceptions.APIError):
+        return erro.response.status_code == 429 or erro.response.status_code >= 500
+    # Só rede: outros OSError (ex.: arquivo da fila sem permissão) não passam com nova tentativa
+    return isinstance(erro, (requests.exceptions.RequestException, ConnectionError, TimeoutError))
+
+def enviar_pendentes(fila):
+    """
+    Envia a fila em lotes com append_rows, removendo do disco cada lote confirmado.
+    Antes do envio os IDs são conferidos com os dados sincronizados e com as linhas
+    gravadas depois da última sincronização: linhas que já estão na planilha não são
+    enviadas de novo, e IDs tomados por outro processo são trocados (e gravados na fila).
+    """
+    with fila['lock']:
+        lote = list(fila['pendentes'])
+    if not lote:
+        return
+
+    abas = dict(zip(["Manutenção", "Controlador"], abrir_fonte_dados()))
+    for nome_aba, aba in abas.items():
+        entradas = [entrada for entrada in lote if entrada['aba'] == nome_aba]
+        if not entradas:
+            continue
+
+        ids_anteriores = [entrada['linha'][0] for entrada in entradas]
+        linhas_a_enviar, linhas_gravadas = conferir_ids(nome_aba, aba, [entrada['linha'] for entrada in entradas])
+        ids_a_enviar, ids_gravadas = set(map(id, linhas_a_enviar)), set(map(id, linhas_gravadas))
+        a_enviar = [entrada for entrada in entradas if id(entrada['linha']) in ids_a_enviar]
+        ja_gravadas = [entrada for entrada in entradas if id(entrada['linha']) in ids_gravadas]
+        if [entrada['linha'][0] for entrada in entradas] != ids_anteriores:
+            # IDs trocados vão para o disco antes do envio, para uma nova tentativa não trocar de novo
+            with fila['lock']:
+                gravar_fila_no_disco(fila['pendentes'])
+
+        for inicio in range(0, max(len(a_enviar), 1), TAMANHO_LOTE_ENVIO):
+            parte = a_enviar[inicio:inicio + TAMANHO_LOTE_ENVIO]
+            if parte:
+                chamar_api(aba.append_rows, [entrada['linha'] for entrada in parte], prioridade=PRIORIDADE_ESCRITA)
+            confirmadas = parte + (ja_gravadas if inicio == 0 else [])
+            with fila['lock']:
+                fila['pendentes'] = [entrada for entrada in fila['pendentes']
+                                     if not any(entrada is confirmada for confirmada in confirmadas)]
+                gravar_fila_no_disco(fila['pendentes'])
+
+@st.cache_resource
+def fila_envios():
+    """
+    Fila de envios do processo, carregada do disco, com a thread que a esvazia.
+    Falhas temporárias são repetidas com espera exponencial; nada sai da fila sem confirmação.
+    """
+    fila = {
+        'lock': threading.Lock(),
+        'pendentes': ler_fila_do_disco(),
+        'acordar': threading.Event(),
+        'status': 'ok',
+        'ultimo_erro': None,
+        'falhas_seguidas': 0
+    }
+
+    def executar():
+        espera = None
+        while True:
+            fila['acordar'].wait(espera)
+            fila['acordar'].clear()
+            if not fila['pendentes']:
+                espera = None
+                continue
+
+            # Junta os envios que chegam ao mesmo tempo num lote só
+            time.sleep(ESPERA_LOTE)
+            try:
+                enviar_pendentes(fila)
+                fila['status'] = 'ok'
+                fila['ultimo_erro'] = None
+                fila['falhas_seguidas'] = 0
+                espera = None
+                solicitar_atualizacao()
+            except Exception as e:
+                fila['falhas_seguidas'] += 1
+                fila['ultimo_erro'] = str(e)
+                if erro_temporario(e):
+                    fila['status'] = 'aguardando nova tentativa'
+                    espera = min(2 ** fila['falhas_seguidas'], ESPERA_MAXIMA_NOVA_TENTATIVA)
+                else:
+                    fila['status'] = 'erro'
+                    espera = ESPERA_MAXIMA_NOVA_TENTATIVA
+
+    fila['thread'] = threading.Thread(target=executar, name="fila-envios", daemon=True)
+    fila['thread'].start()
+    if fila['pendentes']:
+        fila['acordar'].set()
+    return fila
+
+def enfileirar_linhas(nome_aba, linhas):
+    """
+    Grava as linhas na fila local (com fsync) e acorda o envio em segundo plano
+    """
+    fila = fila_envios()
+    criado_em = datetime.now().isoformat()
+    entradas = [{'aba': nome_aba, 'linha': linha, 'criado_em': criado_em} for linha in linhas]
+    with fila['lock']:
+        PASTA_FILA.mkdir(exist_ok=True)
+        with open(ARQUIVO_FILA, 'a', encoding='utf-8') as arquivo_fila:
+            for entrada in entradas:
+                arquivo_fila.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+            arquivo_fila.flush()
+            os.fsync(arquivo_fila.fileno())
+        fila['pendentes'].extend(entradas)
+    fila['acordar'].set()
+
+def enfileirar_linha(nome_aba, linha):
+    enfileirar_linhas(nome_aba, [linha])
+
+def mostrar_status_fila():
+    fila = fila_envios()
+    pendentes = len(fila['pendentes'])
+    if pendentes:
+        st.info(f"📬 {pendentes} atividade(s) aguardando envio para a planilha")
+    if fila['status'] != 'ok' and fila['ultimo_erro']:
+        st.warning(f"⚠️ Envio para a planilha {fila['status']}: {fila['ultimo_erro']}")
+
 # Função para criar campo com dropdown SIMPLIFICADA (sem "Outro")
-def criar_campo_dropdown(label, obrigatorio=False, key_suffix=""):
+# OPÇÕES REAIS DA SUA PLANILHA (formulários e validação da importação em lote)
+OPCOES_CAMPOS = {
+    "Módulo": ["Controlador", "Home Page", "Portal da Transparência", "Sai Conecta", 
+               "Ouvidoria/Esic", "Diário Oficial/SEJ", "E-mail", "PNCP", 
+               "Publicação Tutorial", "Fora do ar"],
+    "Responsável": ["Georgeton", "Felipe A.", "Vanessa", "Jonas", "Danilo", 
+                    "Rebeca", "Filipe", "Elton", "Cristiano (estagiário)", "Fredson"],
+    "Sprint": ["Sprint 1", "Sprint 2", "Sprint 3", "Sprint 4"],
+    "Status": ["Pendente", "Em Andamento", "Concluída", "Cancelada"],
+    "Falha/ Teste em Produção": ["Sim", "Não"]
+}
+
+def criar_campo_dropdown(label, obrigatorio=False, key_suffix="", nome_aba="Manutenção"):
     """
     Cria um campo com dropdown baseado nas opções reais da planilha
     """
-    # OPÇÕES REAIS DA SUA PLANILHA
-    if "Módulo" in label:
-        opcoes_reais = ["Controlador", "Home Page", "Portal da Transparência", "Sai Conecta", 
-                       "Ouvidoria/Esic", "Diário Oficial/SEJ", "E-mail", "PNCP", 
-                       "Publicação Tutorial", "Fora do ar"]
-    elif "Responsável" in label:
-        opcoes_reais = ["Georgeton", "Felipe A.", "Vanessa", "Jonas", "Danilo", 
-                       "Rebeca", "Filipe", "Elton", "Cristiano (estagiário)", "Fredson"]
-    elif "Sprint" in label:
-        opcoes_reais = ["Sprint 1", "Sprint 2", "Sprint 3", "Sprint 4"]
-    else:
-        opcoes_reais = []
+    campo = next((campo for campo in ["Módulo", "Responsável", "Sprint"] if campo in label), None)
+    opcoes_reais = list(OPCOES_CAMPOS[campo]) if campo else []
+    
+    # Valores que já aparecem nos dados da aba (dicionário da versão atual) entram depois das opções fixas
+    dicionarios = dicionarios_do_estado(nome_aba) if campo else None
+    if dicionarios:
+        opcoes_reais += [valor for valor in valores_dimensao(dicionarios, campo)
+                         if valor not in opcoes_reais and valor not in ('Sem Responsável', 'Sem Módulo')]
     
     # Criar opções completas (sem "Outro")
     opcoes_completas = ["Selecione..."] + opcoes_reais
@@ -157,11 +1085,22 @@ def inserir_dados_planilha():
     
     st.markdown("---")
     
+    modo = st.radio(
+        "Como deseja inserir?",
+        ["Uma atividade", "Importação em lote (CSV/XLSX)"],
+        horizontal=True,
+        key="modo_insercao"
+    )
+    
     # Formulário específico para cada aba
-    if aba_selecionada == "Manutenção":
+    if modo != "Uma atividade":
+        importar_dados_em_lote(aba_selecionada)
+    elif aba_selecionada == "Manutenção":
         inserir_dados_manutencao()
     else:
         inserir_dados_controlador()
+    
+    mostrar_status_fila()
 
 # Função para inserir dados na aba MANUTENÇÃO (SIMPLIFICADA)
 def inserir_dados_manutencao():
@@ -182,8 +1121,8 @@ def inserir_dados_manutencao():
             responsavel = criar_campo_dropdown("Responsável", obrigatorio=True, key_suffix="manutencao")
             
         with col2:
-            status = st.selectbox("Status*", ["Pendente", "Em Andamento", "Concluída", "Cancelada"], key="status_manutencao")
-            falha_teste = st.selectbox("Falha/Teste em Produção*", ["Sim", "Não"], key="falha_teste_manutencao")
+            status = st.selectbox("Status*", OPCOES_CAMPOS["Status"], key="status_manutencao")
+            falha_teste = st.selectbox("Falha/Teste em Produção*", OPCOES_CAMPOS["Falha/ Teste em Produção"], key="falha_teste_manutencao")
             
             # Campo Sprint com dropdown SIMPLES
             sprint = criar_campo_dropdown("Sprint", key_suffix="manutencao")
@@ -209,11 +1148,13 @@ def inserir_dados_manutencao():
             else:
                 try:
                     # Conectar com a planilha
-                    aba_manutencao, _ = setup_gsheets()
+                    aba_manutencao, _ = abrir_fonte_dados()
+                    if getattr(aba_manutencao, 'somente_leitura', False):
+                        raise RuntimeError("a fonte de dados configurada é somente leitura")
                     
                     # Preparar os dados para inserção (na ordem das colunas)
                     novo_registro = [
-                        len(aba_manutencao.get_all_records()) + 1,  # ID automático
+                        alocar_id("Manutenção"),  # ID automático
                         atividade,
                         modulo,
                         data_abertura.strftime("%Y-%m-%d"),
@@ -224,15 +1165,14 @@ def inserir_dados_manutencao():
                         sprint if sprint != "Selecione..." else ""
                     ]
                     
-                    # Inserir na planilha
-                    aba_manutencao.append_row(novo_registro)
+                    # Registrar na fila local; o envio para a planilha é feito em lote, em segundo plano
+                    enfileirar_linha("Manutenção", novo_registro)
+                    # E já aparece no dashboard (write-through), sem recarregar a planilha
+                    incorporar_linhas_ao_estado("Manutenção", [novo_registro])
                     
-                    st.success("✅ Atividade salva na aba Manutenção com sucesso!")
+                    st.success("✅ Atividade registrada! Ela será gravada na aba Manutenção em instantes.")
                     st.balloons()
                     
-                    # Limpar cache para atualizar os dados
-                    st.cache_data.clear()
-                    
                 except Exception as e:
                     st.error(f"❌ Erro ao salvar atividade: {e}")
 
@@ -247,13 +1187,13 @@ def inserir_dados_controlador():
             atividade = st.text_input("Atividade*", placeholder="Descreva a atividade", key="atividade_controlador")
             
             # Campo Módulo com dropdown SIMPLES
-            modulo = criar_campo_dropdown("Módulo", obrigatorio=True, key_suffix="controlador")
+            modulo = criar_campo_dropdown("Módulo", obrigatorio=True, key_suffix="controlador", nome_aba="Controlador")
             
             data_abertura = st.date_input("Data de Abertura*", datetime.now(), key="data_abertura_controlador")
             
         with col2:
             # Campo Responsável com dropdown SIMPLES
-            responsavel = criar_campo_dropdown("Responsável", obrigatorio=True, key_suffix="controlador")
+            responsavel = criar_campo_dropdown("Responsável", obrigatorio=True, key_suffix="controlador", nome_aba="Controlador")
             
             data_entrega = st.date_input("Data de Entrega", datetime.now(), key="data_entrega_controlador")
             pontos = st.number_input("Pontos*", min_value=0, max_value=100, value=1, step=1, key="pontos_controlador")
@@ -277,11 +1217,13 @@ def inserir_dados_controlador():
             else:
                 try:
                     # Conectar com a planilha
-                    _, aba_controlador = setup_gsheets()
+                    _, aba_controlador = abrir_fonte_dados()
+                    if getattr(aba_controlador, 'somente_leitura', False):
+                        raise RuntimeError("a fonte de dados configurada é somente leitura")
                     
                     # Preparar os dados para inserção (na ordem das colunas do Controlador)
                     novo_registro = [
-                        len(aba_controlador.get_all_records()) + 1,  # ID automático
+                        alocar_id("Controlador"),  # ID automático
                         atividade,
                         modulo,
                         data_abertura.strftime("%Y-%m-%d"),
@@ -290,74 +1232,340 @@ def inserir_dados_controlador():
                         pontos
                     ]
                     
-                    # Inserir na planilha
-                    aba_controlador.append_row(novo_registro)
+                    # Registrar na fila local; o envio para a planilha é feito em lote, em segundo plano
+                    enfileirar_linha("Controlador", novo_registro)
+                    # E já aparece no dashboard (write-through), sem recarregar a planilha
+                    incorporar_linhas_ao_estado("Controlador", [novo_registro])
                     
-                    st.success("✅ Atividade salva na aba Controlador com sucesso!")
+                    st.success("✅ Atividade registrada! Ela será gravada na aba Controlador em instantes.")
                     st.balloons()
                     
-                    # Limpar cache para atualizar os dados
-                    st.cache_data.clear()
-                    
                 except Exception as e:
                     st.error(f"❌ Erro ao salvar atividade: {e}")
 
-def calcular_dias_em_aberto(df):
+# Importação em lote: mesmas colunas de manutencao.xlsx/atricon.xlsx, na ordem da planilha
+# (COLUNAS_DASHBOARD, as colunas lidas pelo dashboard)
+CAMPOS_OBRIGATORIOS_IMPORTACAO = {
+    "Manutenção": ['Atividade', 'Módulo', 'Data Abertura', 'Responsável', 'Falha/ Teste em Produção', 'Status'],
+    "Controlador": ['Atividade', 'Módulo', 'Data Abertura', 'Responsável', 'Pontos']
+}
+# Colunas opcionais que podem faltar no arquivo (ID é sempre gerado de novo)
+COLUNAS_OPCIONAIS_IMPORTACAO = ['ID', 'Data Entrega', 'Sprint']
+
+def ler_arquivo_importacao(arquivo, nome_aba):
     """
-    Calcula dias em aberto para demandas não finalizadas
+    Lê o CSV/XLSX enviado; num XLSX com as duas abas, usa a aba de mesmo nome.
+    Células vazias viram '' para a validação tratar tudo do mesmo jeito.
     """
-    if df.empty:
-        return pd.DataFrame()
-    
-    df_alerta = df.copy()
-    
-    # Status que indicam "não finalizado"
-    status_nao_finalizados = ['Pendente', 'Em Andamento', 'Aberta', 'Aberto', 'Open', 'To Do', 'In Progress', 'Em Desenvolvimento']
-    
-    # Filtrar por status não finalizados
-    status_existentes = [s for s in status_nao_finalizados if s in df_alerta['Status'].values]
-    
-    if status_existentes:
-        df_alerta = df_alerta[df_alerta['Status'].isin(status_existentes)]
+    if arquivo.name.lower().endswith('.csv'):
+        df = pd.read_csv(arquivo, dtype=str, keep_default_na=False)
     else:
-        # Fallback: usar data entrega vazia
-        if 'Data Entrega' in df_alerta.columns:
-            df_alerta = df_alerta[
-                df_alerta['Data Entrega'].isna() | 
-                (df_alerta['Data Entrega'] == '') |
-                (df_alerta['Data Entrega'].astype(str).str.strip() == '') |
-                (df_alerta['Data Entrega'].astype(str).str.strip() == 'NaT')
-            ]
+        planilhas = pd.read_excel(arquivo, sheet_name=None)
+        df = planilhas.get(nome_aba, next(iter(planilhas.values())))
+    df.columns = [str(coluna).strip() for coluna in df.columns]
+    return df.astype(object).where(df.notna(), '')
+
+def validar_importacao(df, nome_aba):
+    """
+    Valida todas as linhas de uma vez (sem laço por linha): campos obrigatórios,
+    valores fora das opções dos formulários, datas e pontos.
+    Retorna (linhas válidas já formatadas, relatório de linhas rejeitadas).
+    """
+    df = df.reindex(columns=COLUNAS_DASHBOARD[nome_aba], fill_value='')
+    texto = df.drop(columns=['Data Abertura', 'Data Entrega']).astype(str).apply(lambda coluna: coluna.str.strip())
+    regras = []
+
+    # Campos obrigatórios
+    for coluna in CAMPOS_OBRIGATORIOS_IMPORTACAO[nome_aba]:
+        vazio = df[coluna].astype(str).str.strip().eq('')
+        regras.append((vazio, f"{coluna} vazio"))
+
+    # Opções dos dropdowns (também vale o que já existe na planilha, ex.: status antigos)
+    dicionarios = dicionarios_do_estado(nome_aba) or {}
+    for coluna, opcoes in OPCOES_CAMPOS.items():
+        if coluna not in texto.columns:
+            continue
+        permitidas = set(opcoes) | set(valores_dimensao(dicionarios, coluna))
+        invalido = texto[coluna].ne('') & ~texto[coluna].isin(permitidas)
+        regras.append((invalido, f"{coluna} fora das opções"))
+
+    # Datas
+    datas = {}
+    for coluna in ['Data Abertura', 'Data Entrega']:
+        preenchida = df[coluna].astype(str).str.strip().ne('')
+        datas[coluna] = converter_datas(df[coluna].where(preenchida, ''))
+        regras.append((preenchida & datas[coluna].isna(), f"{coluna} inválida"))
+    regras.append((datas['Data Entrega'] < datas['Data Abertura'], "Data Entrega antes da Data Abertura"))
+
+    # Pontos (mesmos limites do formulário)
+    if 'Pontos' in texto.columns:
+        pontos = pd.to_numeric(texto['Pontos'], errors='coerce')
+        fora = texto['Pontos'].ne('') & (pontos.isna() | (pontos < 0) | (pontos > 100) | (pontos % 1 != 0))
+        regras.append((fora, "Pontos deve ser inteiro entre 0 e 100"))
+
+    # Junta os motivos de cada linha, regra a regra
+    motivos = pd.Series('', index=df.index)
+    for mascara, mensagem in regras:
+        motivos = motivos.where(~mascara.to_numpy(), motivos + mensagem + "; ")
+    rejeitada = motivos.ne('')
+
+    relatorio = df[rejeitada].copy()
+    # Linha no arquivo (cabeçalho na linha 1)
+    relatorio.insert(0, 'Linha', relatorio.index + 2)
+    relatorio.insert(1, 'Motivos', motivos[rejeitada].str.rstrip('; '))
+
+    validas = texto[~rejeitada].copy()
+    for coluna in ['Data Abertura', 'Data Entrega']:
+        validas[coluna] = datas[coluna][~rejeitada].dt.strftime("%Y-%m-%d").fillna('')
+    if 'Pontos' in validas.columns:
+        validas['Pontos'] = pd.to_numeric(validas['Pontos']).astype(int)
+    return validas[COLUNAS_DASHBOARD[nome_aba]], relatorio.astype(str)
+
+TENTATIVAS_ENVIO_LOTE = 5
+
+def enviar_em_lotes(aba, linhas, ao_enviar=None):
+    """
+    Envia as linhas com append_rows em lotes de TAMANHO_LOTE_ENVIO, repetindo com espera
+    exponencial nos erros temporários (cota/rede). Retorna (linhas enviadas, erro ou None).
+    """
+    enviadas = 0
+    while enviadas < len(linhas):
+        lote = linhas[enviadas:enviadas + TAMANHO_LOTE_ENVIO]
+        for tentativa in range(TENTATIVAS_ENVIO_LOTE):
+            try:
+                chamar_api(aba.append_rows, lote, prioridade=PRIORIDADE_ESCRITA)
+                break
+            except Exception as e:
+                if not erro_temporario(e) or tentativa == TENTATIVAS_ENVIO_LOTE - 1:
+                    return enviadas, e
+                time.sleep(min(2 ** tentativa, ESPERA_MAXIMA_NOVA_TENTATIVA))
+        enviadas += len(lote)
+        if ao_enviar:
+            ao_enviar(enviadas)
+    return enviadas, None
+
+def importar_dados_em_lote(nome_aba):
+    st.subheader(f"📥 Importação em Lote - Aba {nome_aba}")
+    st.caption(f"Colunas esperadas (mesmo layout da planilha): {', '.join(COLUNAS_DASHBOARD[nome_aba])}. "
+               "O ID é gerado automaticamente.")
     
-    if df_alerta.empty or 'Data Abertura' not in df_alerta.columns:
-        return pd.DataFrame()
+    # Depois de uma importação o uploader ganha chave nova (volta vazio) e o hash do
+    # arquivo fica guardado na sessão, para o mesmo arquivo não ser importado duas vezes
+    importados = st.session_state.setdefault(f"arquivos_importados_{nome_aba}", set())
+    arquivo = st.file_uploader("Arquivo CSV ou XLSX", type=['csv', 'xlsx'],
+                               key=f"arquivo_importacao_{nome_aba}_{len(importados)}")
+    if arquivo is None:
+        return
     
-    # Garantir que as datas estão em formato correto
-    df_alerta['Data Abertura'] = pd.to_datetime(df_alerta['Data Abertura'], errors='coerce')
-    df_alerta = df_alerta.dropna(subset=['Data Abertura'])
+    hash_arquivo = hashlib.sha256(arquivo.getvalue()).hexdigest()
+    if hash_arquivo in importados:
+        st.info(f"ℹ️ O arquivo {arquivo.name} já foi importado nesta sessão.")
+        return
     
-    if df_alerta.empty:
-        return pd.DataFrame()
+    try:
+        df_arquivo = ler_arquivo_importacao(arquivo, nome_aba)
+    except Exception as e:
+        st.error(f"❌ Não foi possível ler o arquivo: {e}")
+        return
     
-    # Calcular dias em aberto
-    hoje = pd.Timestamp.now().normalize()
-    df_alerta['Dias em Aberto'] = (hoje - df_alerta['Data Abertura']).dt.days
+    colunas_faltantes = [coluna for coluna in COLUNAS_DASHBOARD[nome_aba]
+                         if coluna not in df_arquivo.columns and coluna not in COLUNAS_OPCIONAIS_IMPORTACAO]
+    if colunas_faltantes:
+        st.error(f"❌ Colunas obrigatórias ausentes no arquivo: {', '.join(colunas_faltantes)}")
+        return
     
-    # Classificar alertas
-    def classificar_alerta(dias):
-        if dias >= 7:
-            return '🔴 Crítico'
-        elif dias >= 5:
-            return '🟡 Alerta'
-        else:
-            return '✅ Normal'
+    df_validas, relatorio = validar_importacao(df_arquivo, nome_aba)
     
-    df_alerta['Nível Alerta'] = df_alerta['Dias em Aberto'].apply(classificar_alerta)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Linhas no Arquivo", len(df_arquivo))
+    col2.metric("Válidas", len(df_validas))
+    col3.metric("Rejeitadas", len(relatorio))
     
-    # Filtrar apenas alertas (5+ dias)
-    df_alerta = df_alerta[df_alerta['Dias em Aberto'] >= 5]
+    if not relatorio.empty:
+        st.warning(f"⚠️ {len(relatorio)} linha(s) rejeitada(s) - corrija e importe de novo:")
+        st.dataframe(relatorio, use_container_width=True, hide_index=True)
+        st.download_button(
+            "⬇️ Baixar relatório de rejeições",
+            relatorio.to_csv(index=False).encode('utf-8-sig'),
+            file_name=f"rejeicoes_{nome_aba.lower()}.csv",
+            mime="text/csv",
+            key=f"relatorio_importacao_{nome_aba}"
+        )
+    
+    if df_validas.empty:
+        return
     
-    return df_alerta.sort_values('Dias em Aberto', ascending=False)
+    if st.button(f"📤 Enviar {len(df_validas)} linha(s) válida(s) para a aba {nome_aba}", key=f"enviar_importacao_{nome_aba}"):
+        try:
+            aba_manutencao, aba_controlador = abrir_fonte_dados()
+            aba = aba_manutencao if nome_aba == "Manutenção" else aba_controlador
+            if getattr(aba, 'somente_leitura', False):
+                raise RuntimeError("a fonte de dados configurada é somente leitura")
+            
+            # IDs novos reservados de uma vez, na ordem do arquivo
+            df_validas['ID'] = alocar_ids(nome_aba, len(df_validas))
+            linhas = df_validas.values.tolist()
+
+            try:
+                # Confere os IDs com a planilha antes de enviar (troca os que outro processo já usou)
+                conferir_ids(nome_aba, aba, linhas)
+            except Exception as e:
+                if not erro_temporario(e):
+                    raise
+                # Planilha ocupada: tudo vai para a fila, que confere os IDs no envio
+                enviadas, erro = 0, e
+            else:
+                progresso = st.progress(0.0, text="Enviando...")
+                enviadas, erro = enviar_em_lotes(
+                    aba, linhas,
+                    lambda quantidade: progresso.progress(quantidade / len(linhas), text=f"{quantidade} de {len(linhas)} linha(s) enviada(s)")
+                )
+            
+            if erro is not None:
+                # O que não foi enviado vai para a fila local e segue em segundo plano
+                enfileirar_linhas(nome_aba, linhas[enviadas:])
+                st.warning(f"⚠️ {enviadas} linha(s) enviada(s); as outras {len(linhas) - enviadas} ficaram na fila de envios ({erro})")
+            else:
+                st.success(f"✅ {enviadas} atividade(s) importada(s) na aba {nome_aba}!")
+            importados.add(hash_arquivo)
+            
+            # Write-through: as linhas já aparecem no dashboard
+            incorporar_linhas_ao_estado(nome_aba, linhas)
+            solicitar_atualizacao()
+            
+        except Exception as e:
+            st.error(f"❌ Erro ao importar atividades: {e}")
+
+# Índices por versão dos dados (pipeline em metricas.py), compartilhados entre as sessões
+@st.cache_resource(max_entries=2)
+def indice_filtros(versao, _df):
+    return montar_indice_filtros(_df)
+
+@st.cache_resource(max_entries=2)
+def indice_envelhecimento(versao, _df):
+    return montar_indice_envelhecimento(_df)
+
+@st.cache_resource(max_entries=4)
+def ordens_ranking(versao, nome_aba, _df):
+    return montar_ordens_ranking(nome_aba, _df)
+
+@st.cache_resource(max_entries=4)
+def serie_temporal(versao, nome_aba, _df):
+    return montar_series_diarias(_df)
+
+# Cards de alerta mostrados na aba Alertas (as demandas mais antigas primeiro)
+LIMITE_CARDS_ALERTA = 50
+
+# Dicionários de dimensões: valores distintos ordenados e contagens, uma vez por versão dos dados
+VALORES_VAZIOS = ['', 'nan', 'NaN']
+
+@st.cache_resource(max_entries=4)
+def dicionarios_dimensoes(versao, nome_aba, _df):
+    """
+    Para cada dimensão filtrável da aba: os valores distintos (sem vazios) como categorias
+    ordenadas e a contagem de linhas de cada um. Usado pelos filtros, pelas estatísticas
+    da barra lateral e pelos dropdowns dos formulários.
+    """
+    dicionarios = {}
+    for dimensao in DIMENSOES_FILTRO:
+        if dimensao not in _df.columns:
+            continue
+        # Contagem direto nos códigos da categoria (uma passada), só dos valores presentes
+        contagens = _df[dimensao].astype('category').value_counts(sort=False)
+        contagens = contagens[contagens > 0]
+        contagens.index = contagens.index.astype(str)
+        contagens = contagens[~contagens.index.str.strip().isin(VALORES_VAZIOS)].sort_index()
+        dicionarios[dimensao] = {
+            'categorias': pd.CategoricalDtype(contagens.index.tolist(), ordered=True),
+            'contagens': contagens
+        }
+    return dicionarios
+
+def valores_dimensao(dicionarios, dimensao):
+    if dimensao not in dicionarios:
+        return []
+    return list(dicionarios[dimensao]['categorias'].categories)
+
+def dicionarios_do_estado(nome_aba):
+    """
+    Dicionários da versão atual do estado compartilhado (sem copiar o DataFrame);
+    None se a aba ainda não foi carregada
+    """
+    estado = estado_sincronizacao()
+    with estado['lock']:
+        estado_aba = estado['abas'].get(nome_aba)
+        versao = estado['versao']
+    if not estado_aba:
+        return None
+    return dicionarios_dimensoes(versao, nome_aba, estado_aba.get('df_exibicao', estado_aba['df']))
+
+# Cache de resultados filtrados e agregados, compartilhado entre sessões (LRU com validade e limite de memória)
+CACHE_RESULTADOS_MAX_BYTES = 64 * 1024 * 1024
+CACHE_RESULTADOS_VALIDADE = 600  # segundos
+
+@st.cache_resource
+def cache_resultados():
+    return {
+        'lock': threading.Lock(),
+        'entradas': OrderedDict(),  # chave -> (valor, tamanho, criado_em), da menos para a mais recente
+        'bytes': 0,
+        'acertos': 0,
+        'falhas': 0,
+        'despejos': 0
+    }
+
+def tamanho_aproximado(valor):
+    """
+    Estimativa de memória de um resultado (arrays, DataFrames e coleções deles)
+    """
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return int(np.sum(valor.memory_usage(deep=True)))
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamanho_aproximado(item) for item in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(tamanho_aproximado(item) for item in valor)
+    return sys.getsizeof(valor)
+
+def memorizar(chave, calcular):
+    """
+    Devolve o resultado guardado para a chave (se ainda válido) ou calcula e guarda.
+    Os resultados são compartilhados entre sessões: quem usa não deve alterá-los.
+    """
+    cache = cache_resultados()
+    agora = time.monotonic()
+    with cache['lock']:
+        entrada = cache['entradas'].get(chave)
+        if entrada is not None and agora - entrada[2] < CACHE_RESULTADOS_VALIDADE:
+            cache['entradas'].move_to_end(chave)
+            cache['acertos'] += 1
+            return entrada[0]
+        cache['falhas'] += 1
+
+    valor = calcular()
+    if isinstance(valor, np.ndarray):
+        valor.flags.writeable = False
+    tamanho = tamanho_aproximado(valor)
+
+    with cache['lock']:
+        anterior = cache['entradas'].pop(chave, None)
+        if anterior is not None:
+            cache['bytes'] -= anterior[1]
+        if tamanho <= CACHE_RESULTADOS_MAX_BYTES:
+            cache['entradas'][chave] = (valor, tamanho, agora)
+            cache['bytes'] += tamanho
+        # Despeja os menos usados até caber no limite
+        while cache['bytes'] > CACHE_RESULTADOS_MAX_BYTES:
+            _, (_, tamanho_despejado, _) = cache['entradas'].popitem(last=False)
+            cache['bytes'] -= tamanho_despejado
+            cache['despejos'] += 1
+    return valor
+
+# Threads de segundo plano do processo: sobem na primeira execução, em qualquer página,
+# para que envios pendentes no disco (ex.: depois de um reinício) sigam para a planilha
+atualizador_dados()
+fila_envios()
 
 # Sistema de navegação
 st.sidebar.title("🧭 Navegação")
@@ -370,110 +1578,53 @@ pagina = st.sidebar.radio(
 if pagina == "📊 Dashboard":
     st.markdown('<h1 class="main-header">📊 Dashboard Produtividade - Produto SAI </h1>', unsafe_allow_html=True)
 
-    # Prazo estabelecido pela gestão (48 horas = 2 dias)
-    PRAZO_GESTAO = 2
-
-    # Configurar conexão com Google Sheets
-    def setup_gsheets():
-        scope = [
-            "https://spreadsheets.google.com/feeds",
-            "https://www.googleapis.com/auth/drive"
-        ]
-        
-        creds = Credentials.from_service_account_info(
-            st.secrets["gcp_service_account"], scopes=scope
-        )
-        client = gspread.authorize(creds)
-        
-        # Conecta com a planilha "Produtividade"
-        planilha = client.open("Produtividade")
-        
-        # Acessa as abas específicas
-        aba_manutencao = planilha.worksheet("Manutenção")  # Sua aba principal
-        aba_controlador = planilha.worksheet("Controlador")  # Sua aba controlador
-        
-        return aba_manutencao, aba_controlador
-
-    # Carregar dados do Google Sheets 
-    @st.cache_data(ttl=300)  # Cache de 5 minutos
-    def load_data_from_google_sheets():
-        try:
-            # Conectar com as abas
-            aba_manutencao, aba_controlador = setup_gsheets()
-            
-            # Carregar dados da ABA MANUTENÇÃO (sua aba principal)
-            dados_manutencao = aba_manutencao.get_all_records()
-            df_principal = pd.DataFrame(dados_manutencao)
-            
-            # Carregar dados da ABA CONTROLADOR
-            dados_controlador = aba_controlador.get_all_records()
-            df_controlador = pd.DataFrame(dados_controlador)
-            
-            # Limpeza dos dados PRINCIPAIS - trata valores NaN
-            # USANDO OS NOMES CORRETOS DA SUA PLANILHA
-            if 'Responsável' in df_principal.columns:
-                df_principal['Responsável'] = df_principal['Responsável'].fillna('Sem Responsável')
-            if 'Módulo' in df_principal.columns:
-                df_principal['Módulo'] = df_principal['Módulo'].fillna('Sem Módulo')
-            if 'Status' in df_principal.columns:
-                df_principal['Status'] = df_principal['Status'].fillna('Sem Status')
-            if 'Falha / Teste em Produção' in df_principal.columns:  # NOME CORRETO!
-                df_principal['Falha / Teste em Produção'] = df_principal['Falha / Teste em Produção'].fillna('Não')
-
-            # Converte para string (se as colunas existirem)
-            colunas_string = ['Responsável', 'Módulo', 'Status', 'Falha / Teste em Produção']  # NOME CORRETO!
-            for coluna in colunas_string:
-                if coluna in df_principal.columns:
-                    df_principal[coluna] = df_principal[coluna].astype(str)
-
-            # Converter datas (se as colunas existirem)
-            if 'Data Abertura' in df_principal.columns:
-                df_principal['Data Abertura'] = pd.to_datetime(df_principal['Data Abertura'], errors='coerce')
-            if 'Data Entrega' in df_principal.columns:
-                df_principal['Data Entrega'] = pd.to_datetime(df_principal['Data Entrega'], errors='coerce')
-
-            # Calcular tempo de entrega (apenas para datas válidas)
-            if all(col in df_principal.columns for col in ['Data Abertura', 'Data Entrega']):
-                mask = df_principal['Data Abertura'].notna() & df_principal['Data Entrega'].notna()
-                df_principal.loc[mask, 'Tempo Entrega (dias)'] = (df_principal.loc[mask, 'Data Entrega'] - df_principal.loc[mask, 'Data Abertura']).dt.days
-                
-                # Para datas inválidas, definir como NaN
-                df_principal.loc[~mask, 'Tempo Entrega (dias)'] = np.nan
-                
-                # Classificar se cumpriu o prazo (apenas atividades concluídas)
-                df_principal['Cumpriu Prazo'] = 'Não Concluída'
-                mask_concluidas = (df_principal['Status'] == 'Concluída') & df_principal['Tempo Entrega (dias)'].notna()
-                df_principal.loc[mask_concluidas, 'Cumpriu Prazo'] = df_principal.loc[mask_concluidas, 'Tempo Entrega (dias)'].apply(
-                    lambda x: 'Dentro do Prazo' if x <= PRAZO_GESTAO else 'Fora do Prazo'
-                )
-            
-            # Limpeza básica dos dados do CONTROLADOR
-            df_controlador = df_controlador.fillna('')
-            
-            st.success("✅ Dados carregados do Google Sheets com sucesso!")
-            return df_principal, df_controlador
-            
-        except Exception as e:
-            st.error(f"❌ Erro ao carregar dados do Google Sheets: {e}")
-            return None, None
-
-    # Carregar dados
-    df, df_controlador = load_data_from_google_sheets()
+    # Carregar dados - sempre da versão já sincronizada; o atualizador em segundo plano
+    # busca as novidades. Na partida a frio, usa o snapshot local e reconcilia em seguida.
+    if semear_estado_com_snapshot():
+        # O snapshot pode ter linhas editadas depois dele: a reconciliação relê tudo
+        solicitar_atualizacao(completa=True)
+    df, df_controlador, info_dados = dados_do_estado()
+    if df is None:
+        # Nenhuma versão disponível ainda: única carga que bloqueia a sessão
+        df, df_controlador, info_dados = load_data_from_google_sheets()
 
     if df is None:
         st.stop()
 
+    # Status do atualizador; quando chega uma versão nova dos dados, recarrega a página
+    @st.fragment(run_every=15)
+    def status_atualizacao(versao_exibida):
+        atualizador = atualizador_dados()
+        estado = estado_sincronizacao()
+        if estado['versao'] != versao_exibida:
+            st.rerun()
+
+        st.caption(f"Versão dos dados: {versao_exibida}")
+        if atualizador['status'] == 'atualizando':
+            st.caption("🔄 Atualizando em segundo plano...")
+        elif atualizador['status'] == 'erro':
+            st.caption(f"🔴 Falha na última atualização: {atualizador['ultimo_erro']}")
+        elif atualizador['ultima_execucao']:
+            st.caption(f"🟢 Última verificação: {atualizador['ultima_execucao'].strftime('%H:%M:%S')}")
+        if estado.get('aviso_snapshot'):
+            st.caption(f"⚠️ {estado['aviso_snapshot']}")
+        cache = cache_resultados()
+        st.caption(f"🧠 Cache de resultados: {cache['acertos']} acertos · {cache['falhas']} falhas · "
+                   f"{cache['bytes'] / 1024 / 1024:.1f} MB")
+        if configuracao_fonte_dados()['tipo'] == "gsheets":
+            metricas = agendador_api()['metricas']
+            st.caption(f"📡 API: {metricas['chamadas']} chamadas · {metricas['na_fila']} na fila · "
+                       f"{metricas['esperas_por_cota']} esperas por cota · {metricas['leituras_agrupadas']} leituras agrupadas")
+
     # Sidebar - Filtros e informações
     st.sidebar.title("🔧 Filtros")
 
-    # Função segura para obter valores únicos
-    def get_unique_sorted(series):
-        try:
-            unique_vals = series.unique()
-            unique_vals = [str(x) for x in unique_vals if str(x).strip() not in ['', 'nan', 'NaN']]
-            return sorted(unique_vals)
-        except:
-            return []
+    # Valores distintos e contagens de cada dimensão, montados uma vez por versão dos dados
+    dicionarios = dicionarios_dimensoes(info_dados['versao'], "Manutenção", df)
+
+    # Índice dos filtros (dimensões e datas) da versão exibida
+    indice = indice_filtros(info_dados['versao'], df)
+    rankings = ordens_ranking(info_dados['versao'], "Manutenção", df)
 
     # Filtro por DATA 
     st.sidebar.markdown("---")
@@ -500,14 +1651,13 @@ if pagina == "📊 Dashboard":
             coluna_data = colunas_data_disponiveis[0]
             st.sidebar.write(f"**Usando coluna:** {coluna_data}")
         
-        # Agora processa a coluna selecionada
+        # Agora processa a coluna selecionada (já é datetime64; extremos vêm do índice de datas)
         try:
-            df[coluna_data] = pd.to_datetime(df[coluna_data], errors='coerce')
-            datas_validas = df[coluna_data].dropna()
+            dias_ordenados = indice['datas'][coluna_data]['dias_ordenados']
             
-            if not datas_validas.empty:
-                data_min = datas_validas.min().date()
-                data_max = datas_validas.max().date()
+            if len(dias_ordenados):
+                data_min = pd.Timestamp(dias_ordenados[0], unit='D').date()
+                data_max = pd.Timestamp(dias_ordenados[-1], unit='D').date()
                 
                 st.sidebar.write(f"Período disponível: {data_min} a {data_max}")
                 
@@ -553,89 +1703,127 @@ if pagina == "📊 Dashboard":
         data_inicio, data_fim = None, None
 
     st.sidebar.markdown("---")
+
+    periodo = None
+
+    # Filtro por PERÍODO (USANDO A COLUNA SELECIONADA) - busca binária no índice de datas
+    if periodo_selecionado and data_inicio and data_fim:
+        try:
+            periodo = (coluna_data, data_inicio, data_fim)
+            
+            # Verifica se há dados no período selecionado
+            if len(fatia_periodo(indice, *periodo)) == 0:
+                st.warning("📭 Não há dados registrados no período selecionado. Atualize o filtro.")
+        except Exception as e:
+            st.error(f"Erro ao filtrar por período: {e}")
+            periodo = None
+
+    # Filtros de sprint, responsável, módulo e status: várias opções (vazio = todos),
+    # cada opção com a contagem sob os demais filtros ativos
+    chaves_filtros = {'Sprint': 'filtro_sprint', 'Responsável': 'filtro_responsavel', 'Módulo': 'filtro_modulo', 'Status': 'filtro_status'}
+    selecoes_atuais = {dimensao: st.session_state.get(chave, []) for dimensao, chave in chaves_filtros.items()}
+    facetas = memorizar(
+        (info_dados['versao'], periodo) + tuple(tuple(sorted(valores)) for valores in selecoes_atuais.values()) + ('facetas',),
+        lambda: contagens_facetas(indice, selecoes_atuais, periodo)
+    )
+
+    def filtro_multiplo(rotulo, dimensao, opcoes):
+        return st.sidebar.multiselect(
+            rotulo, opcoes,
+            key=chaves_filtros[dimensao],
+            placeholder="Todos",
+            format_func=lambda valor: f"{valor} ({facetas.get(dimensao, {}).get(valor, 0)})"
+        )
         
     # Filtro por SPRINT (NOVO)
-    sprints = ['Todos'] + get_unique_sorted(df['Sprint'])
-    sprint_selecionada = st.sidebar.selectbox("Selecione a Sprint:", sprints)
+    sprints = valores_dimensao(dicionarios, 'Sprint')
+    sprint_selecionada = filtro_multiplo("Selecione a Sprint:", 'Sprint', sprints)
 
     # Filtro por responsável
-    responsaveis_base = get_unique_sorted(df['Responsável'])
+    responsaveis_base = valores_dimensao(dicionarios, 'Responsável')
     if 'Sem Responsável' not in responsaveis_base:
         responsaveis_base.append('Sem Responsável')
-    responsaveis = ['Todos'] + sorted(responsaveis_base)
+    responsaveis = sorted(responsaveis_base)
 
-    responsavel_selecionado = st.sidebar.selectbox("Selecione o Responsável:", responsaveis)
+    responsavel_selecionado = filtro_multiplo("Selecione o Responsável:", 'Responsável', responsaveis)
 
     # Filtro por módulo
-    modulos = ['Todos'] + get_unique_sorted(df['Módulo'])
-    modulo_selecionado = st.sidebar.selectbox("Selecione o Módulo:", modulos)
+    modulos = valores_dimensao(dicionarios, 'Módulo')
+    modulo_selecionado = filtro_multiplo("Selecione o Módulo:", 'Módulo', modulos)
 
     # Filtro por status
-    status_opcoes = ['Todos'] + get_unique_sorted(df['Status'])
-    status_selecionado = st.sidebar.selectbox("Selecione o Status:", status_opcoes)
+    status_opcoes = valores_dimensao(dicionarios, 'Status')
+    status_selecionado = filtro_multiplo("Selecione o Status:", 'Status', status_opcoes)
 
     # Botão para atualizar dados
     st.sidebar.markdown("---")
     if st.sidebar.button("🔄 Atualizar Dados"):
-        st.cache_data.clear()
-        st.rerun()
+        solicitar_atualizacao()
+        st.toast("🔄 Atualização solicitada - os dados novos aparecem assim que chegarem")
+    if st.sidebar.button("♻️ Sincronização Completa", help="Baixa novamente todas as linhas das abas"):
+        solicitar_atualizacao(completa=True)
+        st.toast("♻️ Sincronização completa solicitada")
 
     # Mostrar informações sobre os dados
     st.sidebar.markdown("### 📊 Estatísticas Gerais - Manutenção")
     st.sidebar.markdown(f"**Total de Atividades:** {len(df)}")
-    st.sidebar.markdown(f"**Responsáveis:** {len(get_unique_sorted(df['Responsável']))}")
-    st.sidebar.markdown(f"**Módulos:** {len(get_unique_sorted(df['Módulo']))}")
+    st.sidebar.markdown(f"**Responsáveis:** {len(valores_dimensao(dicionarios, 'Responsável'))}")
+    st.sidebar.markdown(f"**Módulos:** {len(valores_dimensao(dicionarios, 'Módulo'))}")
 
     # Contar atividades sem responsável
-    atividades_sem_responsavel = len(df[df['Responsável'] == 'Sem Responsável'])
+    atividades_sem_responsavel = int(dicionarios['Responsável']['contagens'].get('Sem Responsável', 0))
     st.sidebar.markdown(f"**⚠️ Sem Responsável:** {atividades_sem_responsavel}")
 
-    # Informações de atualização
-    ultima_atualizacao = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-    st.sidebar.markdown(f"**🕒 Última atualização:** {ultima_atualizacao}")
-
-    # Aplicar filtros
-    df_filtrado = df.copy()
-
-    # Filtro por PERÍODO (USANDO A COLUNA SELECIONADA)
-    if periodo_selecionado and data_inicio and data_fim:
-        try:
-            mask_periodo = (df_filtrado[coluna_data].dt.date >= data_inicio) & (df_filtrado[coluna_data].dt.date <= data_fim)
-            df_filtrado = df_filtrado[mask_periodo]
-            
-            # Verifica se há dados após o filtro de período
-            if df_filtrado.empty:
-                st.warning("📭 Não há dados registrados no período selecionado. Atualize o filtro.")
-        except Exception as e:
-            st.error(f"Erro ao filtrar por período: {e}")
-
-    # Filtro por sprint (NOVO)
-    if sprint_selecionada != 'Todos':
-        df_filtrado = df_filtrado[df_filtrado['Sprint'] == sprint_selecionada]
-
-    if responsavel_selecionado != 'Todos':
-        if responsavel_selecionado == 'Sem Responsável':
-            df_filtrado = df_filtrado[df_filtrado['Responsável'] == 'Sem Responsável']
-        else:
-            df_filtrado = df_filtrado[df_filtrado['Responsável'] == responsavel_selecionado]
+    # Informações de atualização (idade real dos dados, não a hora da página)
+    if info_dados and info_dados['atualizado_em']:
+        ultima_atualizacao = info_dados['atualizado_em'].strftime("%d/%m/%Y %H:%M:%S")
+        idade_minutos = (datetime.now() - info_dados['atualizado_em']).total_seconds() / 60
+        st.sidebar.markdown(f"**🕒 Última atualização:** {ultima_atualizacao} (há {idade_minutos:.0f} min)")
+    with st.sidebar:
+        status_atualizacao(info_dados['versao'])
+
+    # Aplicar filtros: sprint, responsável, módulo, status e período pelo índice invertido
+    selecoes = {
+        'Sprint': sprint_selecionada,
+        'Responsável': responsavel_selecionado,
+        'Módulo': modulo_selecionado,
+        'Status': status_selecionado
+    }
 
-    if modulo_selecionado != 'Todos':
-        df_filtrado = df_filtrado[df_filtrado['Módulo'] == modulo_selecionado]
+    # Mesmos filtros na mesma versão dos dados (em qualquer sessão) reaproveitam o resultado
+    chave_filtros = (info_dados['versao'], periodo) + tuple(tuple(sorted(valores)) for valores in selecoes.values())
+    posicoes_filtradas = memorizar(chave_filtros + ('posicoes',), lambda: filtrar_posicoes(indice, selecoes, periodo))
 
-    if status_selecionado != 'Todos':
-        df_filtrado = df_filtrado[df_filtrado['Status'] == status_selecionado]
+    # Um único take no fim, sem cópias intermediárias
+    df_filtrado = df.take(posicoes_filtradas)
 
     # ANÁLISE DE PRAZO - NOVAS MÉTRICAS
     st.sidebar.markdown("---")
     st.sidebar.markdown("### ⏰ Análise de Prazo")
 
+    # Resumo das métricas: direto dos agregados por célula quando o filtro cabe neles
+    # (sem recorte de período); com período, agrega só as linhas filtradas
+    periodo_cobre_tudo = periodo is None or (
+        periodo[1] == data_min and periodo[2] == data_max
+        and len(indice['datas'][coluna_data]['dias_ordenados']) == indice['total_linhas']
+    )
+    if periodo_cobre_tudo:
+        celulas_filtro = info_dados['celulas']['Manutenção']
+        tempos_filtro = info_dados['tempos']['Manutenção']
+    else:
+        celulas_filtro = memorizar(chave_filtros + ('celulas',), lambda: agregar_celulas(df_filtrado))
+        tempos_filtro = memorizar(chave_filtros + ('tempos',), lambda: agregar_tempos(df_filtrado))
+    resumo = resumo_celulas(celulas_filtro, selecoes)
+    # Nenhuma seleção e o período inteiro: estruturas da versão valem sem conferir o filtro
+    sem_filtros = periodo_cobre_tudo and not any(selecoes.values())
+
     # Calcular métricas de prazo para dados filtrados
     df_concluidas_filtrado = df_filtrado[df_filtrado['Status'] == 'Concluída']
-    total_concluidas = len(df_concluidas_filtrado)
+    total_concluidas = int(resumo['concluidas'])
 
     if total_concluidas > 0:
-        dentro_prazo = len(df_concluidas_filtrado[df_concluidas_filtrado['Cumpriu Prazo'] == 'Dentro do Prazo'])
-        fora_prazo = len(df_concluidas_filtrado[df_concluidas_filtrado['Cumpriu Prazo'] == 'Fora do Prazo'])
+        dentro_prazo = int(resumo['dentro_prazo'])
+        fora_prazo = int(resumo['fora_prazo'])
         
         taxa_dentro_prazo = (dentro_prazo / total_concluidas) * 100 if total_concluidas > 0 else 0
         taxa_fora_prazo = (fora_prazo / total_concluidas) * 100 if total_concluidas > 0 else 0
@@ -650,30 +1838,31 @@ if pagina == "📊 Dashboard":
     st.sidebar.markdown("### 🔴 Análise de Falhas")
 
     # Calcular métricas de falhas
-    atividades_com_falha_total = len(df_filtrado[df_filtrado['Falha/ Teste em Produção'] == 'Sim'])
-    taxa_falhas_total = (atividades_com_falha_total / len(df_filtrado)) * 100 if len(df_filtrado) > 0 else 0
+    total_atividades = int(resumo['linhas'])
+    atividades_com_falha_total = int(resumo['falhas'])
+    taxa_falhas_total = (atividades_com_falha_total / total_atividades) * 100 if total_atividades > 0 else 0
 
     st.sidebar.markdown(f"**🔴 Com falha:** {atividades_com_falha_total} ({taxa_falhas_total:.1f}%)")
-    st.sidebar.markdown(f"**🟢 Sem falha:** {len(df_filtrado) - atividades_com_falha_total} ({100 - taxa_falhas_total:.1f}%)")
+    st.sidebar.markdown(f"**🟢 Sem falha:** {total_atividades - atividades_com_falha_total} ({100 - taxa_falhas_total:.1f}%)")
 
     # Métricas principais
     st.subheader("📈 Métricas Principais")
     col1, col2, col3, col4, col5 = st.columns(5)
 
     with col1:
-        total_atividades = len(df_filtrado)
         st.metric("Total de Atividades", total_atividades)
 
     with col2:
-        taxa_conclusao = (df_filtrado['Status'] == 'Concluída').mean() * 100
+        taxa_conclusao = total_concluidas / total_atividades * 100 if total_atividades > 0 else float('nan')
         st.metric("Taxa de Conclusão", f"{taxa_conclusao:.1f}%")
 
     with col3:
         st.metric("Taxa de Falhas", f"{taxa_falhas_total:.1f}%")
 
     with col4:
-        if not df_concluidas_filtrado.empty and 'Tempo Entrega (dias)' in df_concluidas_filtrado.columns:
-            tempo_medio = df_concluidas_filtrado['Tempo Entrega (dias)'].mean()
+        if total_concluidas > 0 and 'soma_tempo_concluidas' in resumo.index:
+            com_tempo = resumo['concluidas_com_tempo']
+            tempo_medio = resumo['soma_tempo_concluidas'] / com_tempo if com_tempo > 0 else float('nan')
             st.metric("Tempo Médio (dias)", f"{tempo_medio:.1f}")
         else:
             st.metric("Tempo Médio (dias)", "N/A")
@@ -719,7 +1908,7 @@ if pagina == "📊 Dashboard":
             
             # Gráfico de cumprimento de prazo (apenas concluídas)
             if total_concluidas > 0:
-                prazo_counts = df_concluidas_filtrado['Cumpriu Prazo'].value_counts()
+                prazo_counts = df_concluidas_filtrado['Cumpriu Prazo'].value_counts()[lambda contagem: contagem > 0]
                 fig_prazo = px.pie(values=prazo_counts.values, names=prazo_counts.index,
                                  title=f'Cumprimento do Prazo ({PRAZO_GESTAO} dias)',
                                  color=prazo_counts.index,
@@ -728,7 +1917,7 @@ if pagina == "📊 Dashboard":
         
         with col2:
             # Gráfico de módulos
-            modulo_counts = df_filtrado['Módulo'].value_counts()
+            modulo_counts = df_filtrado['Módulo'].value_counts()[lambda contagem: contagem > 0]
             fig_modulos = px.bar(x=modulo_counts.index, y=modulo_counts.values,
                                title='Atividades por Módulo',
                                labels={'x': 'Módulo', 'y': 'Quantidade'})
@@ -736,7 +1925,7 @@ if pagina == "📊 Dashboard":
             st.plotly_chart(fig_modulos, use_container_width=True)
             
             # Gráfico de responsáveis
-            resp_counts = df_filtrado['Responsável'].value_counts()
+            resp_counts = df_filtrado['Responsável'].value_counts()[lambda contagem: contagem > 0]
             fig_resp = px.bar(x=resp_counts.index, y=resp_counts.values,
                              title='Atividades por Responsável',
                              labels={'x': 'Responsável', 'y': 'Quantidade'})
@@ -746,49 +1935,9 @@ if pagina == "📊 Dashboard":
     with tab2:
         st.subheader("Análise por Responsável")
         
-        # Métricas por responsável incluindo análise de prazo E FALHAS
-        resp_analysis = df_filtrado.groupby('Responsável').agg({
-            'ID': 'count',
-            'Tempo Entrega (dias)': 'mean',
-            'Falha/ Teste em Produção': lambda x: (x == 'Sim').mean() * 100
-        }).round(2)
-        
-        # Adicionar análise de prazo por responsável
-        prazo_por_responsavel = []
-        atividades_com_falha_detalhes = []
-        
-        for responsavel in resp_analysis.index:
-            df_resp = df_filtrado[df_filtrado['Responsável'] == responsavel]
-            df_resp_concluidas = df_resp[df_resp['Status'] == 'Concluída']
-            
-            # Análise de prazo
-            if len(df_resp_concluidas) > 0:
-                dentro_prazo = len(df_resp_concluidas[df_resp_concluidas['Cumpriu Prazo'] == 'Dentro do Prazo'])
-                taxa_dentro_prazo = (dentro_prazo / len(df_resp_concluidas)) * 100
-            else:
-                taxa_dentro_prazo = 0
-                
-            prazo_por_responsavel.append(taxa_dentro_prazo)
-            
-            # Análise de falhas
-            atividades_com_falha = df_resp[df_resp['Falha/ Teste em Produção'] == 'Sim']
-            
-            # Detalhes das atividades com falha
-            for idx, atividade in atividades_com_falha.iterrows():
-                atividades_com_falha_detalhes.append({
-                    'Responsável': responsavel,
-                    'ID': atividade['ID'],
-                    'Atividade': atividade['Atividade'],
-                    'Módulo': atividade['Módulo'],
-                    'Tempo Entrega (dias)': atividade.get('Tempo Entrega (dias)', 'N/A'),
-                    'Status': atividade['Status']
-                })         
-          
-            
-       
-        resp_analysis['Dentro Prazo (%)'] = prazo_por_responsavel
-        resp_analysis.columns = ['Total Atividades', 'Tempo Médio (dias)', 'Taxa Falhas (%)', 'Dentro Prazo (%)']
-        resp_analysis = resp_analysis.sort_values('Total Atividades', ascending=False)
+        resp_analysis, atividades_com_falha_detalhes = memorizar(
+            chave_filtros + ('responsavel',), lambda: analise_por_responsavel(df_filtrado)
+        )
         
         st.dataframe(resp_analysis, use_container_width=True)
         
@@ -831,7 +1980,7 @@ if pagina == "📊 Dashboard":
             # Tempo médio por responsável (apenas concluídas)
             df_concluidas = df_filtrado[df_filtrado['Status'] == 'Concluída']
             if not df_concluidas.empty and 'Tempo Entrega (dias)' in df_concluidas.columns:
-                tempo_resp = df_concluidas.groupby('Responsável')['Tempo Entrega (dias)'].mean().sort_values()
+                tempo_resp = df_concluidas.groupby('Responsável', observed=True)['Tempo Entrega (dias)'].mean().sort_values()
                 
                 fig_tempo_resp = px.bar(tempo_resp, orientation='h',
                                       title='Tempo Médio por Responsável (dias)',
@@ -873,31 +2022,7 @@ if pagina == "📊 Dashboard":
     with tab3:
         st.subheader("Análise por Módulo")
         
-        # Métricas por módulo incluindo análise de prazo
-        modulo_analysis = df_filtrado.groupby('Módulo').agg({
-            'ID': 'count',
-            'Tempo Entrega (dias)': 'mean',
-            'Falha/ Teste em Produção': lambda x: (x == 'Sim').mean() * 100,
-            'Status': lambda x: (x == 'Concluída').mean() * 100
-        }).round(2)
-        
-        # Adicionar análise de prazo por módulo
-        prazo_por_modulo = []
-        for modulo in modulo_analysis.index:
-            df_mod = df_filtrado[df_filtrado['Módulo'] == modulo]
-            df_mod_concluidas = df_mod[df_mod['Status'] == 'Concluída']
-            
-            if len(df_mod_concluidas) > 0:
-                dentro_prazo = len(df_mod_concluidas[df_mod_concluidas['Cumpriu Prazo'] == 'Dentro do Prazo'])
-                taxa_dentro_prazo = (dentro_prazo / len(df_mod_concluidas)) * 100
-            else:
-                taxa_dentro_prazo = 0
-                
-            prazo_por_modulo.append(taxa_dentro_prazo)
-        
-        modulo_analysis['Dentro Prazo (%)'] = prazo_por_modulo
-        modulo_analysis.columns = ['Total', 'Tempo Médio', 'Taxa Falhas (%)', 'Taxa Conclusão (%)', 'Dentro Prazo (%)']
-        modulo_analysis = modulo_analysis.sort_values('Total', ascending=False)
+        modulo_analysis = memorizar(chave_filtros + ('modulo',), lambda: analise_por_modulo(df_filtrado))
         
         st.dataframe(modulo_analysis, use_container_width=True)
         
@@ -907,7 +2032,7 @@ if pagina == "📊 Dashboard":
             # Tempo por módulo (apenas concluídas)
             df_concluidas = df_filtrado[df_filtrado['Status'] == 'Concluída']
             if not df_concluidas.empty and 'Tempo Entrega (dias)' in df_concluidas.columns:
-                tempo_modulo = df_concluidas.groupby('Módulo')['Tempo Entrega (dias)'].mean().sort_values()
+                tempo_modulo = df_concluidas.groupby('Módulo', observed=True)['Tempo Entrega (dias)'].mean().sort_values()
                 fig_tempo_modulo = px.bar(tempo_modulo, orientation='h',
                                         title='Tempo Médio por Módulo (dias)',
                                         color=tempo_modulo.values,
@@ -947,16 +2072,73 @@ if pagina == "📊 Dashboard":
     with tab4:
         st.subheader("Timeline e Evolução")
         
-        # Evolução mensal
-        if 'Data Abertura' in df_filtrado.columns:
-            df_filtrado['Mês'] = df_filtrado['Data Abertura'].dt.to_period('M').astype(str)
-            evolucao_mensal = df_filtrado.groupby('Mês').size()
-            
-            fig_timeline = px.line(x=evolucao_mensal.index, y=evolucao_mensal.values,
-                                  title='Evolução de Atividades ao Longo do Tempo',
-                                  markers=True)
-            fig_timeline.update_layout(xaxis_title='Mês', yaxis_title='Quantidade de Atividades')
-            st.plotly_chart(fig_timeline, use_container_width=True)
+        # Baldes diários da versão (total e por dimensão) sem filtros; com filtros, das linhas
+        # filtradas. Granularidade e período do gráfico só reagrupam os baldes
+        def baldes_serie(dimensao=None):
+            if sem_filtros:
+                return serie_temporal(info_dados['versao'], "Manutenção", df)[dimensao]
+            return memorizar(chave_filtros + ('serie', dimensao),
+                             lambda: agregar_serie_diaria(df_filtrado, [dimensao] if dimensao else []))
+
+        serie = baldes_serie()
+
+        granularidade = st.radio(
+            "Agrupar por:", list(GRANULARIDADES_SERIE),
+            index=2, horizontal=True, key="timeline_granularidade"
+        )
+
+        if not serie.empty:
+            dias_serie = serie.index.get_level_values('Dia')
+            inicio_serie = pd.Timestamp(dias_serie.min(), unit='D').date()
+            fim_serie = pd.Timestamp(dias_serie.max(), unit='D').date()
+
+            col1, col2 = st.columns([1, 2])
+            with col1:
+                detalhar_por = st.selectbox(
+                    "Detalhar abertas por:", ['Nenhum', 'Responsável', 'Módulo', 'Sprint'],
+                    key="timeline_dimensao"
+                )
+            with col2:
+                if inicio_serie < fim_serie:
+                    inicio_grafico, fim_grafico = st.slider(
+                        "Período do gráfico:", min_value=inicio_serie, max_value=fim_serie,
+                        value=(inicio_serie, fim_serie), format="DD/MM/YYYY", key="timeline_periodo"
+                    )
+                else:
+                    inicio_grafico, fim_grafico = inicio_serie, fim_serie
+
+            evolucao = consultar_serie(serie, {}, granularidade, inicio_grafico, fim_grafico)
+            if evolucao.empty:
+                st.info("📭 Nenhuma atividade aberta ou entregue no período do gráfico")
+            else:
+                metricas_evolucao = {'abertas': 'Abertas', 'entregues': 'Entregues'}
+                fig_timeline = px.line(evolucao.rename(columns=metricas_evolucao), x='Período',
+                                      y=[nome for coluna, nome in metricas_evolucao.items() if coluna in evolucao.columns],
+                                      title='Evolução de Atividades ao Longo do Tempo',
+                                      markers=True)
+                fig_timeline.update_layout(xaxis_title=granularidade, yaxis_title='Quantidade de Atividades',
+                                           legend_title_text='')
+                st.plotly_chart(fig_timeline, use_container_width=True)
+
+                if detalhar_por != 'Nenhum':
+                    evolucao_dimensao = consultar_serie(baldes_serie(detalhar_por), {}, granularidade,
+                                                        inicio_grafico, fim_grafico, detalhar_por)
+                    evolucao_dimensao = evolucao_dimensao[evolucao_dimensao['abertas'] > 0]
+                    fig_dimensao = px.line(evolucao_dimensao, x='Período', y='abertas', color=detalhar_por,
+                                          title=f'Atividades Abertas por {detalhar_por}', markers=True)
+                    fig_dimensao.update_layout(xaxis_title=granularidade, yaxis_title='Atividades Abertas')
+                    st.plotly_chart(fig_dimensao, use_container_width=True)
+
+        # Pontos entregues do Controlador na mesma granularidade
+        if df_controlador is not None and 'Pontos' in df_controlador.columns:
+            serie_controlador = serie_temporal(info_dados['versao'], "Controlador", df_controlador)[None]
+            pontos_entregues = consultar_serie(serie_controlador, {}, granularidade)
+            if not pontos_entregues.empty and 'pontos_entregues' in pontos_entregues.columns:
+                fig_pontos_tempo = px.bar(pontos_entregues, x='Período', y='pontos_entregues',
+                                         title='Pontos Entregues (Controlador)',
+                                         color_discrete_sequence=['#FF6B6B'])
+                fig_pontos_tempo.update_layout(xaxis_title=granularidade, yaxis_title='Pontos')
+                st.plotly_chart(fig_pontos_tempo, use_container_width=True)
 
     with tab5:
         st.subheader("⏰ Análise Detalhada de Prazos")
@@ -1072,9 +2254,10 @@ if pagina == "📊 Dashboard":
             st.markdown("### 🐌 Top 5 Atividades Mais Atrasadas")
             
             if total_concluidas > 0:
-                atividades_atrasadas = df_concluidas_filtrado[df_concluidas_filtrado['Cumpriu Prazo'] == 'Fora do Prazo']
-                if not atividades_atrasadas.empty:
-                    top5_atrasadas = atividades_atrasadas.nlargest(5, 'Tempo Entrega (dias)')
+                # Percorre o ranking da versão e fica com as 5 primeiras dentro do filtro
+                posicoes_atrasadas = primeiras_do_ranking(rankings['mais_atrasadas'], 5, posicoes_filtradas)
+                if len(posicoes_atrasadas) > 0:
+                    top5_atrasadas = df.take(posicoes_atrasadas)
                     for idx, atividade in top5_atrasadas.iterrows():
                         dias_atraso = atividade['Tempo Entrega (dias)'] - PRAZO_GESTAO
                         st.markdown(f"""
@@ -1091,7 +2274,7 @@ if pagina == "📊 Dashboard":
             
             st.markdown("### ⚡ Atividades Mais Rápidas")
             if total_concluidas > 0:
-                atividades_rapidas = df_concluidas_filtrado.nsmallest(5, 'Tempo Entrega (dias)')
+                atividades_rapidas = df.take(primeiras_do_ranking(rankings['mais_rapidas'], 5, posicoes_filtradas))
                 for idx, atividade in atividades_rapidas.iterrows():
                     st.markdown(f"""
                     <div class="fast-activity">
@@ -1101,25 +2284,40 @@ if pagina == "📊 Dashboard":
                     </div>
                     """, unsafe_allow_html=True)
 
+        # PERCENTIS DO TEMPO DE ENTREGA - juntando os histogramas de tempo das células filtradas
+        st.markdown("---")
+        st.markdown("### 📐 Percentis do Tempo de Entrega (SLA)")
+
+        percentis_gerais = percentis_tempos(tempos_filtro, selecoes)
+        if percentis_gerais.empty:
+            st.info("📭 Nenhuma atividade concluída com tempo de entrega nos filtros selecionados")
+        else:
+            geral = percentis_gerais.iloc[0]
+            colunas_percentis = st.columns(len(PERCENTIS_SLA))
+            for coluna_percentil, percentil in zip(colunas_percentis, PERCENTIS_SLA):
+                valor = geral[f'P{percentil} (dias)']
+                coluna_percentil.metric(
+                    f"P{percentil}", f"{valor:.1f} dias",
+                    delta=f"{valor - PRAZO_GESTAO:+.1f} vs prazo",
+                    delta_color="inverse"
+                )
+
+            dimensao_percentis = st.radio(
+                "Percentis por:", ['Responsável', 'Módulo', 'Sprint'],
+                horizontal=True, key="percentis_dimensao"
+            )
+            tabela_percentis = percentis_tempos(tempos_filtro, selecoes, dimensao_percentis)
+            tabela_percentis = tabela_percentis.sort_values(f'P{PERCENTIS_SLA[-1]} (dias)', ascending=False)
+            st.dataframe(tabela_percentis.round(1), use_container_width=True)
+            st.caption(f"Prazo de gestão: {PRAZO_GESTAO} dias. Percentis acima dele indicam a fração de entregas fora do SLA.")
+
     with tab6:
         st.subheader("🎛️ Análise da Aba Controlador")
         
         if df_controlador is not None:
-            # Limpeza e preparação dos dados do Controlador
-            df_controlador_clean = df_controlador.copy()
-            
-            # Preencher valores vazios
-            df_controlador_clean['Responsável'] = df_controlador_clean['Responsável'].fillna('Sem Responsável')
-            df_controlador_clean['Módulo'] = df_controlador_clean['Módulo'].fillna('Sem Módulo')
-            df_controlador_clean['Pontos'] = pd.to_numeric(df_controlador_clean['Pontos'], errors='coerce').fillna(0)
-            
-            # Converter datas
-            df_controlador_clean['Data Abertura'] = pd.to_datetime(df_controlador_clean['Data Abertura'], errors='coerce')
-            df_controlador_clean['Data Entrega'] = pd.to_datetime(df_controlador_clean['Data Entrega'], errors='coerce')
-            
-            # Calcular tempo de entrega
-            mask = df_controlador_clean['Data Abertura'].notna() & df_controlador_clean['Data Entrega'].notna()
-            df_controlador_clean.loc[mask, 'Tempo Entrega (dias)'] = (df_controlador_clean.loc[mask, 'Data Entrega'] - df_controlador_clean.loc[mask, 'Data Abertura']).dt.days
+            # Dados do Controlador já chegam limpos e tipados (normalização no carregamento)
+            df_controlador_clean = df_controlador
+            rankings_controlador = ordens_ranking(info_dados['versao'], "Controlador", df_controlador_clean)
             
             # VISUALIZAÇÃO DOS DADOS COM LUPA EXPANSÍVEL
             st.markdown("### 📋 Visualização dos Dados")
@@ -1182,7 +2380,9 @@ if pagina == "📊 Dashboard":
             with col2:
                 # Top demandas mais difíceis
                 st.markdown("#### 🏆 Top 5 Demandas Mais Complexas")
-                top_dificil = df_controlador_clean.nlargest(5, 'Pontos')[['ID', 'Atividade', 'Pontos', 'Responsável']]
+                top_dificil = df_controlador_clean.take(
+                    primeiras_do_ranking(rankings_controlador['mais_complexas'], 5)
+                )[['ID', 'Atividade', 'Pontos', 'Responsável']]
                 for idx, demanda in top_dificil.iterrows():
                     st.markdown(f"""
                     <div class="slow-activity">
@@ -1199,12 +2399,10 @@ if pagina == "📊 Dashboard":
             
             with col1:
                 # Pontos por responsável
-                pontos_por_resp = df_controlador_clean.groupby('Responsável').agg({
-                    'ID': 'count',
-                    'Pontos': 'sum',
-                    'Tempo Entrega (dias)': 'mean'
-                }).round(1)
-                pontos_por_resp.columns = ['Total Demandas', 'Pontos Totais', 'Tempo Médio (dias)']
+                pontos_por_resp = memorizar(
+                    (info_dados['versao'], 'controlador', 'responsavel'),
+                    lambda: metricas_agrupadas(df_controlador_clean, 'Responsável')[['Total', 'Pontos Totais', 'Tempo Médio (dias)']].round(1)
+                ).rename(columns={'Total': 'Total Demandas'})
                 pontos_por_resp = pontos_por_resp.sort_values('Pontos Totais', ascending=False)
                 
                 st.markdown("#### 📊 Pontos por Responsável")
@@ -1229,11 +2427,10 @@ if pagina == "📊 Dashboard":
             
             with col1:
                 # Pontos por módulo
-                pontos_por_modulo = df_controlador_clean.groupby('Módulo').agg({
-                    'ID': 'count',
-                    'Pontos': 'sum'
-                }).round(1)
-                pontos_por_modulo.columns = ['Total Demandas', 'Pontos Totais']
+                pontos_por_modulo = memorizar(
+                    (info_dados['versao'], 'controlador', 'modulo'),
+                    lambda: metricas_agrupadas(df_controlador_clean, 'Módulo')[['Total', 'Pontos Totais']].round(1)
+                ).rename(columns={'Total': 'Total Demandas'})
                 pontos_por_modulo = pontos_por_modulo.sort_values('Pontos Totais', ascending=False)
                 
                 st.markdown("#### 📊 Módulos por Complexidade")
@@ -1253,20 +2450,23 @@ if pagina == "📊 Dashboard":
             st.markdown("### 💡 Insights do Controlador")
             
             # Responsável com mais pontos (mais complexidade)
-            resp_mais_pontos = pontos_por_resp.nlargest(1, 'Pontos Totais')
+            # As tabelas já estão ordenadas por pontos: a primeira linha é a maior
+            resp_mais_pontos = pontos_por_resp.head(1)
             if not resp_mais_pontos.empty:
                 resp, dados = list(resp_mais_pontos.iterrows())[0]
                 st.info(f"**🏆 Maior complexidade:** {resp} - {dados['Pontos Totais']} pontos totais")
             
             # Módulo mais complexo
-            modulo_mais_pontos = pontos_por_modulo.nlargest(1, 'Pontos Totais')
+            modulo_mais_pontos = pontos_por_modulo.head(1)
             if not modulo_mais_pontos.empty:
                 mod, dados = list(modulo_mais_pontos.iterrows())[0]
                 st.info(f"**🔧 Módulo mais complexo:** {mod} - {dados['Pontos Totais']} pontos totais")
             
             # Demanda mais difícil
             if not df_controlador_clean.empty:
-                demanda_mais_dificil = df_controlador_clean.nlargest(1, 'Pontos')
+                demanda_mais_dificil = df_controlador_clean.take(
+                    primeiras_do_ranking(rankings_controlador['mais_complexas'], 1)
+                )
                 if not demanda_mais_dificil.empty:
                     demanda = demanda_mais_dificil.iloc[0]
                     st.warning(f"**🚨 Demanda mais complexa:** ID {demanda['ID']} - {demanda['Pontos']} pontos - {demanda['Responsável']}")
@@ -1287,14 +2487,15 @@ if pagina == "📊 Dashboard":
         </div>
         """, unsafe_allow_html=True)
     
-    # Calcular demandas em alerta
-        df_alertas = calcular_dias_em_aberto(df_filtrado)
+    # Calcular demandas em alerta (pontos de corte no índice de envelhecimento da versão)
+        # Sem filtros, os cortes valem direto (sem conferir o filtro linha a linha)
+        df_alertas, criticos, alertas = calcular_dias_em_aberto(
+            df, indice_envelhecimento(info_dados['versao'], df), None if sem_filtros else posicoes_filtradas
+        )
     
         if not df_alertas.empty:
             # Estatísticas rápidas
             total_alertas = len(df_alertas)
-            criticos = len(df_alertas[df_alertas['Nível Alerta'] == '🔴 Crítico'])
-            alertas = len(df_alertas[df_alertas['Nível Alerta'] == '🟡 Alerta'])
         
             col1, col2, col3 = st.columns(3)
         
@@ -1325,7 +2526,8 @@ if pagina == "📊 Dashboard":
                 # Mostrar detalhes das demandas
                 st.markdown(f"### 📋 Detalhes das Demandas em Alerta ({len(df_alertas_filtrado)})")
             
-                for idx, demanda in df_alertas_filtrado.iterrows():
+                # Cards só das mais antigas; com milhares em aberto a página continua leve
+                for idx, demanda in df_alertas_filtrado.head(LIMITE_CARDS_ALERTA).iterrows():
                     # Definir cor baseada no nível
                     if demanda['Nível Alerta'] == '🔴 Crítico':
                         cor_borda = "#f44336"
@@ -1354,6 +2556,8 @@ if pagina == "📊 Dashboard":
                         </div>
                     </div>
                     """, unsafe_allow_html=True)
+                if len(df_alertas_filtrado) > LIMITE_CARDS_ALERTA:
+                    st.caption(f"Mostrando as {LIMITE_CARDS_ALERTA} mais antigas de {len(df_alertas_filtrado)} demandas em alerta.")
                     
                 # Gráfico de distribuição
                 st.markdown("---")
@@ -1376,7 +2580,7 @@ if pagina == "📊 Dashboard":
                 with col2:
                     # Gráfico por responsável
                     if len(df_alertas_filtrado) > 0:
-                        alertas_por_resp = df_alertas_filtrado.groupby('Responsável').size().sort_values(ascending=False)
+                        alertas_por_resp = df_alertas_filtrado.groupby('Responsável', observed=True).size().sort_values(ascending=False)
                         fig_resp_alertas = px.bar(
                             x=alertas_por_resp.index,
                             y=alertas_por_resp.values,
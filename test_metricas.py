@@ -0,0 +1,173 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from metricas import (
+    DIAS_ALERTA, DIAS_CRITICO, ORDENS_RANKING, STATUS_NAO_FINALIZADOS,
+    converter_datas, agregar_celulas, agregar_tempos, somar_celulas, percentis_histograma,
+    montar_indice_envelhecimento, cortes_alerta, calcular_dias_em_aberto,
+    montar_indice_filtros, filtrar_posicoes, contagens_facetas, montar_ordens_ranking, primeiras_do_ranking
+)
+
+HOJE = pd.Timestamp('2025-10-20')
+
+
+def gerar_demandas(quantidade=2000, semente=7):
+    """
+    Aba de Manutenção já normalizada, com valores repetidos, vazios e empates de tempo
+    """
+    gerador = np.random.default_rng(semente)
+
+    def sortear(valores, vazios=0.0):
+        coluna = pd.Series(gerador.choice(valores, quantidade), dtype=object)
+        coluna[gerador.random(quantidade) < vazios] = None
+        return coluna.astype('category')
+
+    abertura = HOJE - pd.to_timedelta(gerador.integers(0, 60, quantidade), unit='D')
+    status = sortear(['Concluída', 'Em Andamento', 'Pendente'])
+    tempo = pd.Series(gerador.integers(0, 15, quantidade), dtype=float)
+    tempo[gerador.random(quantidade) < 0.1] = np.nan
+    entrega = pd.Series(abertura + pd.to_timedelta(tempo, unit='D'))
+    entrega[status != 'Concluída'] = pd.NaT
+    return pd.DataFrame({
+        'Responsável': sortear(['Ana', 'Bruno', 'Carla', 'Danilo'], vazios=0.05),
+        'Módulo': sortear(['Compras', 'Estoque', 'Fiscal']),
+        'Sprint': sortear([f'Sprint {numero}' for numero in range(1, 7)]),
+        'Status': status,
+        'Mês': pd.Series(abertura.strftime('%Y-%m')),
+        'Data Abertura': pd.Series(abertura),
+        'Data Entrega': entrega,
+        'Tempo Entrega (dias)': tempo,
+        'Cumpriu Prazo': sortear(['Dentro do Prazo', 'Fora do Prazo']),
+        'Falha/ Teste em Produção': sortear(['Sim', 'Não'])
+    })
+
+
+def filtrar_na_forca(df, selecoes, periodo=None):
+    mascara = np.ones(len(df), dtype=bool)
+    for dimensao, valores in selecoes.items():
+        if valores:
+            mascara &= df[dimensao].isin(valores).to_numpy()
+    if periodo is not None:
+        coluna, inicio, fim = periodo
+        mascara &= df[coluna].between(pd.Timestamp(inicio), pd.Timestamp(fim)).to_numpy()
+    return np.flatnonzero(mascara)
+
+
+def test_converter_datas_texto_com_dia_primeiro():
+    # Dia <= 12 não pode virar mês (01/10/2025 é 1º de outubro, não 10 de janeiro)
+    datas = converter_datas(pd.Series(['01/10/2025', '15/10/2025', '2025-10-03', 45931, ''], dtype=object))
+    assert datas.tolist()[:4] == [
+        pd.Timestamp('2025-10-01'), pd.Timestamp('2025-10-15'), pd.Timestamp('2025-10-03'), pd.Timestamp('2025-10-01')
+    ]
+    assert pd.isna(datas.iloc[4])
+
+
+def test_filtrar_posicoes_igual_ao_filtro_do_pandas():
+    df = gerar_demandas()
+    indice = montar_indice_filtros(df)
+    casos = [
+        ({}, None),
+        ({'Responsável': ['Ana', 'Carla'], 'Status': []}, None),
+        ({'Sprint': ['Sprint 2', 'Sprint 2'], 'Módulo': ['Fiscal']}, None),
+        ({'Responsável': ['Ninguém']}, None),
+        ({}, ('Data Abertura', date(2025, 9, 10), date(2025, 9, 30))),
+        ({'Status': ['Concluída'], 'Módulo': ['Compras', 'Estoque']}, ('Data Entrega', date(2025, 9, 1), date(2025, 10, 5))),
+        ({'Responsável': ['Bruno']}, ('Data Abertura', date(2025, 10, 20), date(2025, 10, 20)))
+    ]
+    for selecoes, periodo in casos:
+        esperado = filtrar_na_forca(df, selecoes, periodo)
+        np.testing.assert_array_equal(filtrar_posicoes(indice, selecoes, periodo), esperado)
+
+
+def test_contagens_facetas_ignoram_o_filtro_da_propria_dimensao():
+    df = gerar_demandas()
+    indice = montar_indice_filtros(df)
+    selecoes = {'Responsável': ['Ana'], 'Módulo': ['Fiscal', 'Estoque'], 'Sprint': [], 'Status': ['Pendente']}
+    periodo = ('Data Abertura', date(2025, 9, 1), date(2025, 10, 15))
+    contagens = contagens_facetas(indice, selecoes, periodo)
+    for dimensao in selecoes:
+        outras = {outra: valores for outra, valores in selecoes.items() if outra != dimensao}
+        linhas = df.iloc[filtrar_na_forca(df, outras, periodo)]
+        esperado = linhas[dimensao].value_counts().to_dict()
+        assert contagens[dimensao] == {valor: esperado.get(valor, 0) for valor in df[dimensao].cat.categories}
+
+
+def test_primeiras_do_ranking_igual_ao_nlargest_e_nsmallest():
+    df = gerar_demandas()
+    indice = montar_indice_filtros(df)
+    ordens = montar_ordens_ranking("Manutenção", df)
+    # Filtro amplo (caminhada pela ordem), estreito (postos das linhas filtradas) e sem filtro
+    filtros = [None, filtrar_posicoes(indice, {'Sprint': ['Sprint 3']}), filtrar_posicoes(indice, {'Responsável': ['Ana'], 'Módulo': ['Fiscal'], 'Sprint': ['Sprint 1']})]
+    for nome, (coluna, crescente, condicao) in ORDENS_RANKING["Manutenção"].items():
+        for posicoes_filtradas in filtros:
+            linhas = df if posicoes_filtradas is None else df.iloc[posicoes_filtradas]
+            # O ranking nunca traz linhas sem valor; o nlargest/nsmallest as traria com menos de N elegíveis
+            linhas = linhas[condicao(linhas) & linhas[coluna].notna()]
+            for quantidade in (1, 10, 500):
+                if crescente:
+                    esperado = linhas.nsmallest(quantidade, coluna, keep='first')
+                else:
+                    esperado = linhas.nlargest(quantidade, coluna, keep='first')
+                posicoes = primeiras_do_ranking(ordens[nome], quantidade, posicoes_filtradas)
+                np.testing.assert_array_equal(df.index[posicoes], esperado.index)
+
+
+def test_percentis_histograma_igual_ao_numpy():
+    gerador = np.random.default_rng(3)
+    for quantidade in (1, 2, 7, 1000):
+        amostra = gerador.integers(0, 40, quantidade).astype(float)
+        tempos, contagens = np.unique(amostra, return_counts=True)
+        percentis = [0, 25, 50, 90, 99, 100]
+        np.testing.assert_allclose(percentis_histograma(tempos, contagens, percentis), np.percentile(amostra, percentis))
+
+
+def test_alertas_iguais_a_contagem_de_dias_em_aberto():
+    df = gerar_demandas()
+    indice_filtros = montar_indice_filtros(df)
+    indice = montar_indice_envelhecimento(df)
+    hoje = (HOJE - pd.Timestamp(0)).days
+    # Sem filtro, com filtro e com um filtro sem nenhuma aberta (cai nas sem Data Entrega)
+    filtros = [None, filtrar_posicoes(indice_filtros, {'Responsável': ['Bruno'], 'Módulo': ['Estoque']}), filtrar_posicoes(indice_filtros, {'Status': ['Concluída']})]
+    for posicoes_filtradas in filtros:
+        linhas = df if posicoes_filtradas is None else df.iloc[posicoes_filtradas]
+        abertas = linhas['Status'].isin(STATUS_NAO_FINALIZADOS)
+        grupo = linhas[abertas] if abertas.any() else linhas[linhas['Data Entrega'].isna()]
+        dias = (HOJE - grupo['Data Abertura']).dt.days
+        em_alerta = grupo.assign(dias=dias)[dias >= DIAS_ALERTA].sort_values('Data Abertura', kind='stable')
+        criticos = int((em_alerta['dias'] >= DIAS_CRITICO).sum())
+
+        nome_grupo, fim_criticos, fim_alertas = cortes_alerta(indice, posicoes_filtradas, hoje)
+        assert nome_grupo == ('abertas' if abertas.any() else 'sem_entrega')
+        if posicoes_filtradas is None:
+            assert (fim_criticos, fim_alertas) == (criticos, len(em_alerta))
+
+        df_alerta, total_criticos, total_alertas = calcular_dias_em_aberto(df, indice, posicoes_filtradas, hoje)
+        assert (total_criticos, total_alertas) == (criticos, len(em_alerta) - criticos)
+        np.testing.assert_array_equal(df_alerta.index, em_alerta.index)
+        np.testing.assert_array_equal(df_alerta['Dias em Aberto'], em_alerta['dias'])
+        np.testing.assert_array_equal(df_alerta['Nível Alerta'] == '🔴 Crítico', em_alerta['dias'] >= DIAS_CRITICO)
+
+
+def test_somar_celulas_de_lotes_igual_a_agregar_tudo():
+    df = gerar_demandas()
+    # Lotes como na sincronização incremental: a carga inicial, um lote vazio e a cauda
+    cortes = [0, 1200, 1200, 1990, len(df)]
+    celulas = agregar_celulas(df.iloc[:0])
+    tempos = agregar_tempos(df.iloc[:0])
+    for inicio, fim in zip(cortes[:-1], cortes[1:]):
+        lote = df.iloc[inicio:fim]
+        celulas = somar_celulas(celulas, agregar_celulas(lote))
+        tempos = somar_celulas(tempos, agregar_tempos(lote))
+
+    pd.testing.assert_frame_equal(celulas.sort_index(), agregar_celulas(df).sort_index())
+    pd.testing.assert_series_equal(tempos.sort_index(), agregar_tempos(df).sort_index())
+
+    # Conferência das somas contra um groupby direto nas linhas
+    chaves = ['Responsável', 'Módulo', 'Sprint', 'Status', 'Mês']
+    por_celula = df.astype({chave: str for chave in chaves}).groupby(chaves, dropna=False)
+    assert celulas['linhas'].sort_index().tolist() == por_celula.size().sort_index().astype(float).tolist()
+    concluidas = df[(df['Status'] == 'Concluída') & df['Tempo Entrega (dias)'].notna()]
+    assert tempos.sum() == len(concluidas)
+    assert celulas['soma_tempo_concluidas'].sum() == concluidas['Tempo Entrega (dias)'].sum()